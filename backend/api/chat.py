@@ -2,45 +2,207 @@
 Chat API endpoints
 """
 import uuid
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional, List
-from sqlalchemy.orm import Session
+import hashlib
+from types import MappingProxyType
+from dataclasses import dataclass
+import orjson
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request, BackgroundTasks
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from typing import Optional, List, Dict, AsyncIterator
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.core.llm import chat_completion, stream_chat_completion
+from backend.core.vectorstore import get_vector_store
 from backend.services.rag_service import get_rag_service
 from backend.services.chat_history_service import ChatHistoryService
-from backend.models.database import get_db
+from backend.services.semantic_cache import get_semantic_cache
+from backend.models.database import get_db, get_db_context
 from backend.config import get_settings
 
 router = APIRouter()
 settings = get_settings()
 
+DIRECT_SYSTEM_PROMPT = "你是一个专业的《数据结构》课程助教。"
+_SYSTEM_MSG = MappingProxyType({"role": "system", "content": DIRECT_SYSTEM_PROMPT})
+
+# Retrieval below this top relevance score falls back to the direct answer
+SPECULATIVE_RELEVANCE_THRESHOLD = 0.5
+
+# Keep references to fire-and-forget tasks so they are not garbage collected
+_background_tasks = set()
+
 
 class ChatRequest(BaseModel):
     """Chat request model"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     message: str
     conversation_id: Optional[str] = None
     user_id: Optional[int] = None  # For logged-in users
     use_rag: bool = True
 
 
-class SourceReference(BaseModel):
+@dataclass(slots=True, frozen=True)
+class SourceReference:
     """Knowledge source reference"""
-    content: str
-    source: str  # e.g., "《数据结构》第5章第3节"
+    content: str = ""
+    source: str = "Unknown"  # e.g., "《数据结构》第5章第3节"
     relevance_score: float = 0.0
 
 
 class ChatResponse(BaseModel):
     """Chat response model"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     answer: str
     conversation_id: str
     sources: List[SourceReference] = []
     has_context: bool = True
 
 
+# Validates/serializes a whole list of sources in one pydantic-core pass
+_sources_adapter = TypeAdapter(List[SourceReference])
+
+
+def _direct_messages(question: str) -> tuple:
+    """Messages for a direct (non-RAG) LLM call; only the user turn is built per call"""
+    return (_SYSTEM_MSG, {"role": "user", "content": question})
+
+
+def _question_key(question: str) -> str:
+    """Stable key for exact-match response caching of a direct question"""
+    return hashlib.blake2b(question.encode(), digest_size=16).hexdigest()
+
+
+def _ensure_llm_configured():
+    """Raise 503 if the LLM API key is missing"""
+    if not settings.deepseek_api_key:
+        raise HTTPException(
+            status_code=503,
+            detail="LLM API Key 未配置。请在 .env 文件中设置 DEEPSEEK_API_KEY。"
+        )
+
+
+def _sse(payload: Dict) -> str:
+    """Encode a payload as a server-sent event"""
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+
+async def _speculative_rag_answer(question: str, k: int = 5) -> Dict:
+    """
+    Answer with RAG while a direct LLM answer is generated speculatively.
+    
+    Retrieval and the direct call run concurrently. If retrieval finds
+    relevant context the direct call is cancelled; otherwise its answer
+    is already in flight and is returned instead.
+    """
+    rag_service = get_rag_service()
+    direct_task = asyncio.create_task(chat_completion(
+        _direct_messages(question),
+        cache_key=_question_key(question)
+    ))
+    
+    try:
+        context_chunks = await rag_service.retrieve_only(question, k=k)
+    except BaseException:
+        direct_task.cancel()
+        raise
+    
+    # Hybrid results are ordered by fused rank, so check the best vector score
+    if context_chunks and max(
+        c["relevance_score"] for c in context_chunks
+    ) > SPECULATIVE_RELEVANCE_THRESHOLD:
+        direct_task.cancel()
+        return await rag_service.generate_with_context(question, context_chunks)
+    
+    return {
+        "answer": await direct_task,
+        "sources": [],
+        "has_context": False
+    }
+
+
+async def _save_exchange(
+    db: AsyncSession,
+    request: ChatRequest,
+    conversation_id: str,
+    answer: str,
+    sources: Optional[str] = None,
+    has_rag_context: bool = False
+):
+    """
+    Persist the question and answer with one session upsert and one multi-row insert.
+    
+    `sources` is the JSON-encoded source list, stored as-is.
+    """
+    chat_service = ChatHistoryService(db)
+    session_pk = await chat_service.upsert_session(
+        session_id=conversation_id,
+        user_id=request.user_id,
+        first_message=request.message
+    )
+    await chat_service.add_messages_bulk(session_pk, [
+        {"role": "user", "content": request.message, "user_id": request.user_id},
+        {
+            "role": "assistant",
+            "content": answer,
+            "sources": sources,
+            "has_rag_context": has_rag_context
+        }
+    ])
+
+
+async def _save_exchange_in_background(
+    request: ChatRequest,
+    conversation_id: str,
+    answer: str,
+    sources: Optional[str] = None,
+    has_rag_context: bool = False
+):
+    """Persist an exchange using its own database session"""
+    async with get_db_context() as db:
+        await _save_exchange(
+            db, request, conversation_id, answer,
+            sources=sources, has_rag_context=has_rag_context
+        )
+
+
+async def _begin_exchange_in_background(request: ChatRequest, conversation_id: str) -> int:
+    """Store the question and a placeholder answer; returns the placeholder's id"""
+    async with get_db_context() as db:
+        return await ChatHistoryService(db).begin_exchange(
+            conversation_id, request.message, user_id=request.user_id
+        )
+
+
+async def _finish_exchange_in_background(
+    placeholder: "asyncio.Task[int]",
+    answer: str,
+    sources: Optional[str] = None,
+    has_rag_context: bool = False
+):
+    """Fill in the placeholder answer once it has been written"""
+    message_id = await placeholder
+    async with get_db_context() as db:
+        await ChatHistoryService(db).finish_message(
+            message_id, answer, sources=sources, has_rag_context=has_rag_context
+        )
+
+
+def _spawn(coro) -> asyncio.Task:
+    """Run a fire-and-forget task, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
 @router.post("/", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat(
+    request: ChatRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks
+):
     """
     Send a message to AI Tutor and get a response.
     
@@ -48,59 +210,44 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
     - **conversation_id**: Optional conversation ID for context continuity
     - **user_id**: Optional user ID for logged-in users
     - **use_rag**: Whether to use RAG for retrieval (default: True)
+    
+    Clients sending `Accept: text/event-stream` get the streaming response
+    of `/stream` instead.
     """
     # Check if API key is configured
-    if not settings.deepseek_api_key:
-        raise HTTPException(
-            status_code=503,
-            detail="LLM API Key 未配置。请在 .env 文件中设置 DEEPSEEK_API_KEY。"
-        )
+    _ensure_llm_configured()
     
-    # Get or create chat session
-    chat_service = ChatHistoryService(db)
-    session = chat_service.get_or_create_session(
-        session_id=request.conversation_id,
-        user_id=request.user_id
-    )
-    conversation_id = session.session_id
+    if "text/event-stream" in http_request.headers.get("accept", ""):
+        return await chat_stream(request)
+    
+    # The session is created (or touched) together with the messages below
+    conversation_id = request.conversation_id or str(uuid.uuid4())
     
     try:
-        # Save user message
-        chat_service.add_message(
-            session_id=conversation_id,
-            role="user",
-            content=request.message,
-            user_id=request.user_id
-        )
-        
         if request.use_rag:
-            # Use RAG service for retrieval-augmented generation
-            rag_service = get_rag_service()
-            result = await rag_service.query(
-                question=request.message,
-                k=5,
-                include_sources=True
-            )
+            # Reuse a cached answer for semantically similar questions
+            semantic_cache = get_semantic_cache()
+            # Answers cached before any worker changed the knowledge base never match
+            generation = get_vector_store().generation()
+            query_embedding = await asyncio.to_thread(semantic_cache.embed, request.message)
+            result = semantic_cache.lookup(query_embedding, generation)
+            
+            if result is None:
+                # Use RAG service for retrieval-augmented generation
+                result = await _speculative_rag_answer(request.message, k=5)
+                semantic_cache.insert(query_embedding, result, generation)
             
             # Format sources
-            sources = [
-                SourceReference(
-                    content=s.get("content", ""),
-                    source=s.get("source", "Unknown"),
-                    relevance_score=s.get("relevance_score", 0.0)
-                )
-                for s in result.get("sources", [])
-            ]
+            sources = _sources_adapter.validate_python(result.get("sources", []))
             
             answer = result["answer"]
             has_context = result.get("has_context", True)
             
-            # Save assistant message with sources
-            chat_service.add_message(
-                session_id=conversation_id,
-                role="assistant",
-                content=answer,
-                sources=[s.dict() for s in sources],
+            # Save user and assistant messages after the response is sent
+            background_tasks.add_task(
+                _save_exchange_in_background,
+                request, conversation_id, answer,
+                sources=_sources_adapter.dump_json(sources).decode(),
                 has_rag_context=has_context
             )
             
@@ -112,19 +259,14 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
             )
         else:
             # Direct LLM call without RAG
-            from backend.core.llm import chat_completion
-            
-            answer = await chat_completion([
-                {"role": "system", "content": "你是一个专业的《数据结构》课程助教。"},
-                {"role": "user", "content": request.message}
-            ])
+            answer = await chat_completion(
+                _direct_messages(request.message),
+                cache_key=_question_key(request.message)
+            )
             
-            # Save assistant message
-            chat_service.add_message(
-                session_id=conversation_id,
-                role="assistant",
-                content=answer,
-                has_rag_context=False
+            # Save user and assistant messages after the response is sent
+            background_tasks.add_task(
+                _save_exchange_in_background, request, conversation_id, answer
             )
             
             return ChatResponse(
@@ -141,23 +283,120 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
         )
 
 
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Send a message to AI Tutor and stream the response as server-sent events.
+    
+    Each event is a JSON object:
+    - `{"type": "delta", "content": ...}` for each generated text chunk
+    - `{"type": "done", "conversation_id": ..., "sources": [...], "has_context": ...}` at the end
+    - `{"type": "error", "detail": ...}` if generation fails
+    """
+    _ensure_llm_configured()
+    
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+    
+    async def event_stream() -> AsyncIterator[str]:
+        answer_parts = []
+        sources: List[Dict] = []
+        has_context = False
+        
+        # The question and a placeholder answer are written while generating
+        placeholder = _spawn(_begin_exchange_in_background(request, conversation_id))
+        
+        try:
+            if request.use_rag:
+                semantic_cache = get_semantic_cache()
+                generation = get_vector_store().generation()
+                query_embedding = await asyncio.to_thread(semantic_cache.embed, request.message)
+                result = semantic_cache.lookup(query_embedding, generation)
+                
+                if result is None:
+                    # Stream the RAG answer token by token
+                    rag_service = get_rag_service()
+                    context_chunks = await rag_service.retrieve_only(request.message, k=5)
+                    async for token in rag_service.generate_stream(
+                        request.message, context_chunks
+                    ):
+                        answer_parts.append(token)
+                        yield _sse({"type": "delta", "content": token})
+                    
+                    result = {
+                        "answer": "".join(answer_parts),
+                        "sources": rag_service.format_sources(context_chunks),
+                        "has_context": bool(context_chunks)
+                    }
+                    semantic_cache.insert(query_embedding, result, generation)
+                else:
+                    answer_parts.append(result["answer"])
+                    yield _sse({"type": "delta", "content": result["answer"]})
+                
+                sources = _sources_adapter.dump_python(
+                    _sources_adapter.validate_python(result.get("sources", [])),
+                    mode="json"
+                )
+                has_context = result.get("has_context", True)
+            else:
+                async for token in stream_chat_completion(
+                    _direct_messages(request.message)
+                ):
+                    answer_parts.append(token)
+                    yield _sse({"type": "delta", "content": token})
+        except Exception as e:
+            yield _sse({"type": "error", "detail": f"处理请求时发生错误: {str(e)}"})
+            return
+        finally:
+            # Store what was generated, even if the client went away mid-stream
+            _spawn(_finish_exchange_in_background(
+                placeholder,
+                "".join(answer_parts),
+                sources=orjson.dumps(sources).decode() if sources else None,
+                has_rag_context=has_context
+            ))
+        
+        yield _sse({
+            "type": "done",
+            "conversation_id": conversation_id,
+            "sources": sources,
+            "has_context": has_context
+        })
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.get("/history/{conversation_id}")
-async def get_chat_history(conversation_id: str, db: Session = Depends(get_db)):
-    """Get chat history for a conversation"""
+async def get_chat_history(
+    conversation_id: str,
+    limit: Optional[int] = None,
+    before_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get chat history for a conversation, oldest message first.
+    
+    - **limit**: Return only the newest `limit` messages (default: all)
+    - **before_id**: Return messages older than this message id; pass the
+      previous response's `next_cursor` to load earlier messages
+    """
     chat_service = ChatHistoryService(db)
-    messages = chat_service.get_session_history_formatted(conversation_id)
+    messages = await chat_service.get_session_history_formatted(
+        conversation_id, limit=limit, before_id=before_id
+    )
     
-    return {
+    return ORJSONResponse({
         "conversation_id": conversation_id,
-        "messages": messages
-    }
+        "messages": messages,
+        # Messages are chronological, so the oldest one marks the next page
+        "next_cursor": messages[0]["id"] if limit and len(messages) == limit else None
+    })
 
 
 @router.delete("/session/{conversation_id}")
-async def delete_chat_session(conversation_id: str, db: Session = Depends(get_db)):
+async def delete_chat_session(conversation_id: str, db: AsyncSession = Depends(get_db)):
     """Delete a chat session"""
     chat_service = ChatHistoryService(db)
-    success = chat_service.delete_session(conversation_id)
+    success = await chat_service.delete_session(conversation_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="会话不存在")
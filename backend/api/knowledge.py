@@ -3,29 +3,122 @@ Knowledge base management API endpoints
 """
 import uuid
 import os
+import codecs
+import asyncio
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from typing import List, Optional, Union
 
+from backend.core.vectorstore import get_vector_store
 from backend.utils.pdf_parser import PDFParser
 from backend.utils.text_splitter import CodeAwareTextSplitter
 from backend.services.rag_service import get_knowledge_service
+from backend.services.semantic_cache import get_semantic_cache
 from backend.config import get_settings
 
 router = APIRouter()
 settings = get_settings()
 
+# PDFs above this size are parsed across worker processes to escape the GIL
+LARGE_PDF_BYTES = 10 * 1024 * 1024
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+_pdf_process_pool: Optional[ProcessPoolExecutor] = None
+
+# Uploads are consumed in fixed-size pieces instead of one full read
+UPLOAD_CHUNK_BYTES = 1 << 20
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+# Allowance for multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+SUPPORTED_EXTENSIONS = frozenset({"pdf", "txt", "md"})
+
+# Search results show at most this many characters per chunk
+SEARCH_PREVIEW_CHARS = 300
+
+
+def _upload_too_large() -> HTTPException:
+    """Error for uploads above MAX_UPLOAD_BYTES"""
+    return HTTPException(
+        status_code=413,
+        detail=f"文件过大，最大支持 {MAX_UPLOAD_BYTES // (1024 * 1024)} MB。"
+    )
+
+
+def _get_pdf_process_pool() -> ProcessPoolExecutor:
+    """Process pool for large PDFs, started on first use"""
+    global _pdf_process_pool
+    if _pdf_process_pool is None:
+        _pdf_process_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pdf_process_pool
+
+
+def shutdown_pdf_process_pool() -> None:
+    """Stop the PDF worker processes, if any were started (app shutdown)"""
+    global _pdf_process_pool
+    if _pdf_process_pool is not None:
+        _pdf_process_pool.shutdown(cancel_futures=True)
+        _pdf_process_pool = None
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject upload bodies above MAX_UPLOAD_BYTES while they arrive.
+    
+    UploadFile parameters are spooled in full before the endpoint runs, so
+    the limit has to be enforced on the raw request stream: an oversized
+    Content-Length is refused up front and chunked bodies are cut off as
+    soon as they cross the limit.
+    """
+    
+    def __init__(self, app: ASGIApp, path: str):
+        self.app = app
+        self.path = path
+        self.max_body_bytes = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and int(content_length) > self.max_body_bytes:
+            error = _upload_too_large()
+            response = ORJSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise _upload_too_large()
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
 
 class DocumentInfo(BaseModel):
     """Document information model"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     id: str
     source: str
     chunk_count: int
-    added_at: str
+    added_at: Union[int, str] = "Unknown"  # Epoch seconds; ISO string for older documents
+
+
+_documents_adapter = TypeAdapter(List[DocumentInfo])
 
 
 class KnowledgeBaseStats(BaseModel):
     """Knowledge base statistics"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     total_documents: int
     total_chunks: int
     collection_name: str
@@ -33,6 +126,7 @@ class KnowledgeBaseStats(BaseModel):
 
 class UploadResponse(BaseModel):
     """Upload response model"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     status: str
     message: str
     document_id: str
@@ -40,6 +134,48 @@ class UploadResponse(BaseModel):
     chunks_added: int
 
 
+async def _save_upload_to_tempfile(file: UploadFile, suffix: str) -> tuple:
+    """
+    Stream an upload to a temporary file.
+    
+    Returns:
+        Tuple of (path, size in bytes); the caller deletes the file
+    """
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise _upload_too_large()
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    return tmp.name, size
+
+
+async def _read_upload_text(file: UploadFile) -> str:
+    """Decode a UTF-8 upload piece by piece so the raw bytes are never held whole"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts = []
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise _upload_too_large()
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+def _preview(content: str) -> str:
+    """Truncate chunk content for search results"""
+    preview = content[:SEARCH_PREVIEW_CHARS]
+    return preview + "..." if len(preview) < len(content) else preview
+
+
 @router.post("/upload", response_model=UploadResponse)
 async def upload_document(file: UploadFile = File(...)):
     """
@@ -47,26 +183,38 @@ async def upload_document(file: UploadFile = File(...)):
     
     Supported formats: PDF, TXT, MD
     """
-    # Validate file type
+    # The request body size is already capped by UploadSizeLimitMiddleware
     filename = file.filename or "unknown"
-    file_ext = filename.lower().split(".")[-1]
+    file_ext = os.path.splitext(filename)[1].lower().lstrip(".")
     
-    if file_ext not in ["pdf", "txt", "md"]:
+    if file_ext not in SUPPORTED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
             detail=f"不支持的文件格式: {file_ext}。请上传 PDF、TXT 或 MD 文件。"
         )
     
+    tmp_path = None
     try:
-        # Read file content
-        content = await file.read()
-        
         # Parse document based on type
+        # CPU-bound work runs off the event loop so other requests keep being served
         if file_ext == "pdf":
-            parsed = PDFParser.extract_text_from_bytes(content, filename)
+            tmp_path, size = await _save_upload_to_tempfile(file, suffix=".pdf")
+            if size > LARGE_PDF_BYTES:
+                # Page ranges are extracted in parallel across the process pool
+                parsed = await asyncio.to_thread(
+                    PDFParser.extract_text_from_pdf,
+                    tmp_path,
+                    filename,
+                    executor=_get_pdf_process_pool(),
+                    workers=PDF_WORKERS
+                )
+            else:
+                parsed = await asyncio.to_thread(
+                    PDFParser.extract_text_from_pdf, tmp_path, filename
+                )
         else:
             # TXT or MD - direct text
-            text_content = content.decode("utf-8")
+            text_content = await _read_upload_text(file)
             parsed = {
                 "filename": filename,
                 "total_pages": 1,
@@ -76,7 +224,7 @@ async def upload_document(file: UploadFile = File(...)):
         
         # Split into chunks
         splitter = CodeAwareTextSplitter(chunk_size=500, chunk_overlap=50)
-        chunks = splitter.split_document(parsed)
+        chunks = await asyncio.to_thread(splitter.split_document, parsed)
         
         if not chunks:
             raise HTTPException(
@@ -89,12 +237,16 @@ async def upload_document(file: UploadFile = File(...)):
         
         # Add to knowledge base
         knowledge_service = get_knowledge_service()
-        result = knowledge_service.add_document(
+        result = await asyncio.to_thread(
+            knowledge_service.add_document,
             chunks=chunks,
             document_id=document_id,
             filename=filename
         )
         
+        # Cached answers may be stale once the knowledge base changes
+        get_semantic_cache().clear()
+        
         return UploadResponse(
             status="success",
             message=f"文档 '{filename}' 上传成功！",
@@ -110,30 +262,25 @@ async def upload_document(file: UploadFile = File(...)):
             status_code=500,
             detail=f"处理文档时发生错误: {str(e)}"
         )
+    finally:
+        if tmp_path:
+            os.unlink(tmp_path)
 
 
 @router.get("/documents", response_model=List[DocumentInfo])
 async def list_documents():
     """List all documents in the knowledge base"""
     knowledge_service = get_knowledge_service()
-    documents = knowledge_service.list_documents()
-    
-    return [
-        DocumentInfo(
-            id=doc["id"],
-            source=doc["source"],
-            chunk_count=doc["chunk_count"],
-            added_at=doc.get("added_at", "Unknown")
-        )
-        for doc in documents
-    ]
+    documents = await asyncio.to_thread(knowledge_service.list_documents)
+    
+    return _documents_adapter.validate_python(documents)
 
 
 @router.delete("/documents/{document_id}")
 async def delete_document(document_id: str):
     """Delete a document from the knowledge base"""
     knowledge_service = get_knowledge_service()
-    result = knowledge_service.delete_document(document_id)
+    result = await asyncio.to_thread(knowledge_service.delete_document, document_id)
     
     if result["status"] == "not_found":
         raise HTTPException(
@@ -141,6 +288,8 @@ async def delete_document(document_id: str):
             detail=f"文档 {document_id} 未找到"
         )
     
+    get_semantic_cache().clear()
+    
     return {
         "status": "success",
         "message": f"已删除 {result['chunks_deleted']} 个文档块"
@@ -151,7 +300,7 @@ async def delete_document(document_id: str):
 async def get_knowledge_base_stats():
     """Get knowledge base statistics"""
     knowledge_service = get_knowledge_service()
-    stats = knowledge_service.get_stats()
+    stats = await asyncio.to_thread(knowledge_service.get_stats)
     
     return KnowledgeBaseStats(
         total_documents=stats["total_documents"],
@@ -168,20 +317,48 @@ async def search_knowledge(query: str, k: int = 5):
     - **query**: Search query
     - **k**: Number of results to return
     """
-    from backend.core.vectorstore import get_vector_store
-    
     vector_store = get_vector_store()
-    results = vector_store.search_with_sources(query, k=k)
+    results = await asyncio.to_thread(vector_store.search_with_sources, query, k)
     
-    return {
+    return ORJSONResponse({
         "query": query,
         "results": [
             {
-                "content": r["content"][:300] + "..." if len(r["content"]) > 300 else r["content"],
+                "content": _preview(r["content"]),
                 "source": r["metadata"].get("source", "Unknown"),
                 "page": r["metadata"].get("page", "N/A"),
                 "relevance_score": r.get("relevance_score", 0)
             }
             for r in results["results"]
         ]
-    }
+    })
+
+
+@router.post("/search/batch")
+async def batch_search_knowledge(queries: List[str], k: int = 5):
+    """
+    Search the knowledge base for several queries in one request.
+    
+    - **queries**: Search queries (JSON array body)
+    - **k**: Number of results per query
+    """
+    vector_store = get_vector_store()
+    batches = await asyncio.to_thread(vector_store.batch_search, queries, k)
+    
+    return ORJSONResponse({
+        "results": [
+            {
+                "query": query,
+                "results": [
+                    {
+                        "content": _preview(r["content"]),
+                        "source": r["metadata"].get("source", "Unknown"),
+                        "page": r["metadata"].get("page", "N/A"),
+                        "relevance_score": r.get("relevance_score", 0)
+                    }
+                    for r in results
+                ]
+            }
+            for query, results in zip(queries, batches)
+        ]
+    })
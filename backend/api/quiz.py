@@ -2,7 +2,7 @@
 Quiz generation and grading API endpoints
 """
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List
 
 router = APIRouter()
@@ -10,6 +10,7 @@ router = APIRouter()
 
 class QuizQuestion(BaseModel):
     """Quiz question model"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     id: str
     question: str
     question_type: str  # "multiple_choice", "fill_blank", "code", "short_answer"
@@ -20,6 +21,7 @@ class QuizQuestion(BaseModel):
 
 class QuizGenerateRequest(BaseModel):
     """Request to generate quiz"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     user_id: str
     knowledge_points: Optional[List[str]] = None  # If None, generate based on weak points
     count: int = 5
@@ -28,12 +30,14 @@ class QuizGenerateRequest(BaseModel):
 
 class QuizSubmission(BaseModel):
     """Quiz answer submission"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     question_id: str
     user_answer: str
 
 
 class GradingResult(BaseModel):
     """Grading result for a single question"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     question_id: str
     is_correct: bool
     score: float
@@ -2,13 +2,15 @@
 User and student profile API endpoints
 """
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from typing import Optional, List, Dict
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.models.database import get_db
+from backend.models.profile import LearningProfile
 from backend.services.user_service import UserService
-from backend.services.chat_history_service import ChatHistoryService
+from backend.services.chat_history_service import ChatHistoryService, session_cursor
 
 router = APIRouter()
 
@@ -16,6 +18,7 @@ router = APIRouter()
 # Request/Response Models
 class UserCreate(BaseModel):
     """User registration model"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     username: str
     email: EmailStr
     password: str
@@ -24,12 +27,14 @@ class UserCreate(BaseModel):
 
 class UserLogin(BaseModel):
     """User login model"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     username: str  # Can be username or email
     password: str
 
 
 class UserResponse(BaseModel):
     """User info response"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     id: int
     username: str
     email: str
@@ -38,6 +43,7 @@ class UserResponse(BaseModel):
 
 class LoginResponse(BaseModel):
     """Login response with token"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
     success: bool
     token: Optional[str] = None
     user: Optional[UserResponse] = None
@@ -46,6 +52,8 @@ class LoginResponse(BaseModel):
 
 class ChatSessionResponse(BaseModel):
     """Chat session info"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+    cursor: str  # Pass the last session's value as /sessions/{user_id}?cursor= for the next page
     session_id: str
     title: Optional[str] = None
     created_at: str
@@ -54,7 +62,7 @@ class ChatSessionResponse(BaseModel):
 
 # API Endpoints
 @router.post("/register", response_model=LoginResponse)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """
     Register a new user account.
     
@@ -69,7 +77,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="密码至少6个字符")
     
     user_service = UserService(db)
-    result = user_service.create_user(
+    result = await user_service.create_user(
         username=user.username,
         email=user.email,
         password=user.password,
@@ -80,7 +88,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=result["error"])
     
     # Auto login after registration
-    login_result = user_service.authenticate(user.username, user.password)
+    login_result = await user_service.authenticate(user.username, user.password)
     
     return LoginResponse(
         success=True,
@@ -90,7 +98,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=LoginResponse)
-async def login_user(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login_user(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """
     User login.
     
@@ -98,7 +106,7 @@ async def login_user(credentials: UserLogin, db: Session = Depends(get_db)):
     - **password**: Password
     """
     user_service = UserService(db)
-    result = user_service.authenticate(credentials.username, credentials.password)
+    result = await user_service.authenticate(credentials.username, credentials.password)
     
     if not result["success"]:
         raise HTTPException(status_code=401, detail=result["error"])
@@ -111,10 +119,10 @@ async def login_user(credentials: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/profile/{user_id}", response_model=UserResponse)
-async def get_user_profile(user_id: int, db: Session = Depends(get_db)):
+async def get_user_profile(user_id: int, db: AsyncSession = Depends(get_db)):
     """Get user profile by ID"""
     user_service = UserService(db)
-    user = user_service.get_user_by_id(user_id)
+    user = await user_service.get_user_by_id(user_id)
     
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
@@ -131,14 +139,26 @@ async def get_user_profile(user_id: int, db: Session = Depends(get_db)):
 async def get_user_chat_sessions(
     user_id: int,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get user's chat session history"""
+    """
+    Get user's chat session history.
+    
+    - **limit**: Page size
+    - **cursor**: `cursor` of the last session of the previous page
+    """
     chat_service = ChatHistoryService(db)
-    sessions = chat_service.get_user_sessions(user_id, limit=limit)
+    try:
+        sessions = await chat_service.get_user_sessions(
+            user_id, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
     
     return [
         ChatSessionResponse(
+            cursor=session_cursor(s),
             session_id=s.session_id,
             title=s.title,
             created_at=s.created_at.isoformat() if s.created_at else "",
@@ -149,13 +169,12 @@ async def get_user_chat_sessions(
 
 
 @router.get("/learning-profile/{user_id}")
-async def get_learning_profile(user_id: int, db: Session = Depends(get_db)):
+async def get_learning_profile(user_id: int, db: AsyncSession = Depends(get_db)):
     """Get student's learning profile with knowledge mastery analysis"""
-    from backend.models.profile import LearningProfile
-    
-    profile = db.query(LearningProfile).filter(
-        LearningProfile.user_id == user_id
-    ).first()
+    result = await db.execute(
+        select(LearningProfile).where(LearningProfile.user_id == user_id)
+    )
+    profile = result.scalars().first()
     
     if not profile:
         raise HTTPException(status_code=404, detail="学习档案不存在")
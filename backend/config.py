@@ -23,12 +23,29 @@ class Settings(BaseSettings):
     mysql_password: str = ""
     mysql_database: str = "ai_tutor"
     
+    # MySQL Connection Pool
+    mysql_pool_size: int = 20
+    mysql_max_overflow: int = 10
+    mysql_pool_timeout: int = 30
+    mysql_pool_recycle: int = 3600
+    
     # ChromaDB
     chroma_persist_dir: str = "./data/chroma_db"
     chroma_collection: str = "knowledge_base"
     
     # Embedding Model
     embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    embedding_backend: str = "huggingface"  # "huggingface" or "onnx"
+    embedding_batch_size: int = 64
+    embedding_device: str = "auto"  # "auto", "cpu", "cuda", "cuda:1", ...
+    embedding_fp16: bool = True  # Use FP16 on GPU; set False if similarity quality regresses
+    embedding_cache_path: str = "./data/embedding_cache.sqlite3"  # On-disk chunk embedding cache
+    embedding_dtype: str = "float32"  # "float16" rounds stored and query vectors to half precision
+    hybrid_search: bool = False  # Opt-in: fuse BM25 keyword hits with vector hits for RAG retrieval
+    vector_quantization: str = "none"  # "int8" or "binary": in-memory quantized scan + exact re-rank
+    embedding_onnx_dir: str = "./data/onnx_embedding"
+    embedding_onnx_file: str = "model.onnx"  # e.g. model_quantized.onnx for INT8
+    embedding_onnx_threads: int = 0  # 0 = ONNX Runtime default (physical cores)
     
     # JWT Configuration
     jwt_secret_key: str = "your-secret-key-change-in-production"
@@ -40,6 +57,11 @@ class Settings(BaseSettings):
         """Generate MySQL connection URL"""
         return f"mysql+pymysql://{self.mysql_user}:{self.mysql_password}@{self.mysql_host}:{self.mysql_port}/{self.mysql_database}"
     
+    @property
+    def mysql_async_url(self) -> str:
+        """Generate async MySQL connection URL (aiomysql driver)"""
+        return f"mysql+aiomysql://{self.mysql_user}:{self.mysql_password}@{self.mysql_host}:{self.mysql_port}/{self.mysql_database}"
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
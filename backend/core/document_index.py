@@ -0,0 +1,131 @@
+"""
+SQLite side table of documents stored in the vector store
+"""
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Dict, Iterable, List, Tuple
+
+
+class DocumentIndex:
+    """
+    One row per ingested document: (document_id, source, added_at, chunk_count).
+
+    Kept next to the Chroma data so listing documents and counting them
+    does not require loading every chunk's metadata.
+
+    It also holds the knowledge base generation, a counter bumped in the
+    same transaction as every upsert and delete. Worker processes compare
+    it with the value they last saw to notice changes made by other
+    workers and drop their stale caches and indexes.
+    """
+
+    FILENAME = "documents.sqlite3"
+
+    def __init__(self, persist_dir: str):
+        self.path = os.path.join(persist_dir, self.FILENAME)
+        self._lock = threading.Lock()
+        os.makedirs(persist_dir, exist_ok=True)
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "document_id TEXT PRIMARY KEY, "
+                "source TEXT NOT NULL, "
+                "added_at INTEGER NOT NULL, "  # Epoch seconds (ISO text for older chunks)
+                "chunk_count INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+        # Autocommit, so every generation read sees the latest committed value
+        self._reader = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._reader_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    @staticmethod
+    def _bump_generation(conn: sqlite3.Connection) -> int:
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        return conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def generation(self) -> int:
+        """Current knowledge base generation (one indexed read on a kept-open connection)"""
+        with self._reader_lock:
+            return self._reader.execute(
+                "SELECT value FROM meta WHERE key = 'generation'"
+            ).fetchone()[0]
+
+    def is_empty(self) -> bool:
+        """Whether no documents have been recorded yet"""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone() is None
+
+    def upsert(self, document_id: str, source: str, added_at: int, chunk_count: int) -> int:
+        """Record a document, replacing any previous row for the same id; returns the new generation"""
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (document_id, source, added_at, chunk_count) "
+                "VALUES (?, ?, ?, ?)",
+                (document_id, source, added_at, chunk_count)
+            )
+            return self._bump_generation(conn)
+
+    def rebuild(self, metadatas: Iterable[Dict]) -> None:
+        """
+        Replace all rows with an aggregation of chunk metadata.
+
+        Used once to backfill the table for collections created before it existed.
+        """
+        documents = {}
+        for meta in metadatas:
+            if meta and "document_id" in meta:
+                doc_id = meta["document_id"]
+                if doc_id not in documents:
+                    documents[doc_id] = [
+                        doc_id,
+                        meta.get("source", "Unknown"),
+                        meta.get("added_at", "Unknown"),
+                        0
+                    ]
+                documents[doc_id][3] += 1
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM documents")
+            conn.executemany(
+                "INSERT INTO documents (document_id, source, added_at, chunk_count) "
+                "VALUES (?, ?, ?, ?)",
+                documents.values()
+            )
+
+    def delete(self, document_id: str) -> int:
+        """Remove a document's row; returns the new generation"""
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+            return self._bump_generation(conn)
+
+    def stats(self) -> Tuple[int, int]:
+        """(document count, total chunk count) in one SELECT"""
+        with closing(self._connect()) as conn:
+            documents, chunks = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM documents"
+            ).fetchone()
+            return documents, chunks
+
+    def list(self) -> List[Dict]:
+        """All recorded documents in insertion order"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT document_id, source, chunk_count, added_at FROM documents ORDER BY rowid"
+            )
+            return [
+                {
+                    "id": doc_id,
+                    "source": source,
+                    "chunk_count": chunk_count,
+                    "added_at": added_at
+                }
+                for doc_id, source, chunk_count, added_at in rows
+            ]
@@ -0,0 +1,150 @@
+"""
+Embedding caches: in-memory LRU for queries, on-disk store for chunks
+"""
+import os
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing
+from typing import List, Optional
+import numpy as np
+
+from backend.config import get_settings
+from backend.core.embeddings import get_embedding_model
+from backend.utils.query_cache import QueryCache
+
+settings = get_settings()
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache mapping SHA-256(text) to its embedding.
+
+    Keys are digests rather than the text itself, so memory use does not
+    grow with query length.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        # Embeddings never go stale, so entries don't expire
+        self._entries = QueryCache(max_size=maxsize, ttl=None)
+
+    def get_or_embed(self, text: str) -> np.ndarray:
+        """
+        Return the cached embedding of `text`, computing it on a miss.
+
+        Returns:
+            Read-only float32 vector (normalized by the embedding model)
+        """
+        key = hashlib.sha256(text.encode()).digest()
+
+        vector = self._entries.get(key)
+        if vector is not None:
+            return vector
+
+        # Encode outside the cache lock so concurrent misses don't serialize
+        vector = np.asarray(get_embedding_model().embed_query(text), dtype=np.float32)
+        vector.setflags(write=False)
+
+        self._entries.set(key, vector)
+        return vector
+
+    def clear(self) -> None:
+        """Drop all cached embeddings"""
+        self._entries.clear()
+
+
+class PersistentEmbeddingCache:
+    """
+    SQLite store mapping SHA-256(model, dtype, text) to an embedding.
+
+    Lets re-ingested documents and duplicate chunks skip the encoder.
+    Vectors are stored in the configured `embedding_dtype`, so a cache hit
+    returns exactly what a fresh encode would store. Model and dtype are
+    part of the key, so switching either never returns stale vectors.
+    """
+
+    # Stay below SQLite's bound-parameter limit on older builds
+    _LOOKUP_BATCH = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dtype = np.float16 if settings.embedding_dtype == "float16" else np.float32
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+            )
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(
+            f"{settings.embedding_model}\0{settings.embedding_dtype}\0{text}".encode()
+        ).digest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, reusing stored vectors and encoding only the misses.
+
+        Args:
+            texts: Chunk texts
+
+        Returns:
+            Embedding vectors in the same order as `texts`
+        """
+        if not texts:
+            return []
+
+        keys = [self._key(t) for t in texts]
+        found = {}
+
+        with self._lock, closing(sqlite3.connect(self.path)) as conn:
+            unique_keys = list(set(keys))
+            for start in range(0, len(unique_keys), self._LOOKUP_BATCH):
+                batch = unique_keys[start:start + self._LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})",
+                    batch
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=self.dtype).astype(np.float32)
+
+        # Encode each missing text once, even if it repeats
+        miss_index = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in miss_index:
+                miss_index[key] = text
+
+        if miss_index:
+            vectors = get_embedding_model().embed_documents(list(miss_index.values()))
+            new_rows = []
+            for key, vector in zip(miss_index, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                found[key] = vector
+                new_rows.append((key, vector.astype(self.dtype).tobytes()))
+
+            with self._lock, closing(sqlite3.connect(self.path)) as conn, conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (hash, vec) VALUES (?, ?)",
+                    new_rows
+                )
+
+        return [found[key].tolist() for key in keys]
+
+
+_embedding_cache = EmbeddingCache()
+_persistent_cache: Optional[PersistentEmbeddingCache] = None
+
+
+def embed_with_cache(text: str) -> np.ndarray:
+    """Embed query text through the shared LRU cache"""
+    return _embedding_cache.get_or_embed(text)
+
+
+def get_persistent_embedding_cache() -> PersistentEmbeddingCache:
+    """Get the shared on-disk chunk embedding cache"""
+    global _persistent_cache
+    if _persistent_cache is None:
+        _persistent_cache = PersistentEmbeddingCache(settings.embedding_cache_path)
+    return _persistent_cache
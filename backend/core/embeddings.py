@@ -1,7 +1,10 @@
 """
 Embedding models for vector representation
 """
+import os
 from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_openai import OpenAIEmbeddings
 
@@ -10,6 +13,104 @@ from backend.config import get_settings
 settings = get_settings()
 
 
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings computed with ONNX Runtime.
+    
+    Expects a directory exported with Optimum, e.g.:
+        optimum-cli export onnx --model <embedding_model> --task feature-extraction \
+            --optimize O3 <dir>
+    The directory holds the tokenizer files and the ONNX graph (optionally
+    quantized). Output matches the sentence-transformers model: mean pooling
+    over the attention mask followed by L2 normalization.
+    """
+    
+    def __init__(
+        self,
+        model_dir: str,
+        model_file: str = "model.onnx",
+        batch_size: int = 64,
+        num_threads: int = 0
+    ):
+        """
+        Load the tokenizer and ONNX inference session.
+        
+        Args:
+            model_dir: Directory with the exported model and tokenizer
+            model_file: ONNX file name inside model_dir
+            batch_size: Texts per inference call
+            num_threads: Intra-op threads (0 lets ONNX Runtime use physical cores)
+        """
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "ONNX embedding backend requires `onnxruntime` and `transformers`. "
+                "Install them with: pip install onnxruntime transformers"
+            ) from e
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads
+        
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into normalized float32 vectors"""
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + self.batch_size],
+                padding="longest",
+                truncation=True,
+                return_tensors="np"
+            )
+            feeds = {
+                name: value.astype(np.int64)
+                for name, value in encoded.items()
+                if name in self._input_names
+            }
+            hidden = self.session.run(None, feeds)[0]  # [batch, seq, dim]
+            
+            # Mean pooling over real (non-padding) tokens
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            
+            # L2 normalization for cosine similarity
+            norms = np.sqrt(np.einsum("ij,ij->i", pooled, pooled))[:, None]
+            batches.append((pooled / np.clip(norms, 1e-12, None)).astype(np.float32))
+        
+        return np.vstack(batches)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of documents.
+        
+        Texts are encoded shortest first so each batch pads only to its own
+        longest text (sentence-transformers does the same inside `encode`);
+        results are returned in the original order.
+        """
+        if not texts:
+            return []
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        encoded = self._encode([texts[i] for i in order])
+        vectors = np.empty_like(encoded)
+        vectors[order] = encoded
+        return vectors.tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query text"""
+        return self._encode([text])[0].tolist()
+
+
 class EmbeddingManager:
     """Manage embedding models for text vectorization"""
     
@@ -37,16 +138,38 @@ class EmbeddingManager:
         """Create the embedding model based on configuration"""
         model_name = settings.embedding_model
         
+        # ONNX Runtime backend (pre-exported model, faster on CPU)
+        if settings.embedding_backend == "onnx":
+            return OnnxEmbeddings(
+                model_dir=settings.embedding_onnx_dir,
+                model_file=settings.embedding_onnx_file,
+                batch_size=settings.embedding_batch_size,
+                num_threads=settings.embedding_onnx_threads
+            )
+        
+        # Only the sentence-transformers backend needs torch
+        import torch
+        
+        device = settings.embedding_device
+        if device == "auto":
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        
         # Use HuggingFace embeddings (local, free)
         # Good multilingual model for Chinese + English content
-        return HuggingFaceEmbeddings(
+        embeddings = HuggingFaceEmbeddings(
             model_name=model_name,
-            model_kwargs={'device': 'cpu'},  # Use 'cuda' if GPU available
+            model_kwargs={'device': device},
             encode_kwargs={
                 'normalize_embeddings': True,  # For cosine similarity
-                'batch_size': 32
+                'batch_size': settings.embedding_batch_size
             }
         )
+        
+        # Half precision on GPU: half the memory traffic, tensor-core matmuls
+        if device.startswith("cuda") and settings.embedding_fp16:
+            embeddings.client.half()
+        
+        return embeddings
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
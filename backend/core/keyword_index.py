@@ -0,0 +1,231 @@
+"""
+In-memory BM25 keyword index over the knowledge base chunks
+"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Sequence, Tuple
+from rank_bm25 import BM25Okapi
+
+# Reciprocal rank fusion constant for hybrid search (score = sum 1 / (RRF_K + rank))
+RRF_K = 60
+
+# Latin/digit words, or runs of CJK characters
+_TOKEN_RE = re.compile(r"[a-z0-9_]+|[\u4e00-\u9fff]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenize mixed Chinese/English text for BM25.
+
+    Latin words are kept whole; CJK runs become overlapping character
+    bigrams, since Chinese has no spaces between words.
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if run[0].isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def reciprocal_rank_fuse(
+    hit_lists: Sequence[Sequence[Tuple[str, Dict]]],
+    k: int
+) -> List[Dict]:
+    """
+    Fuse ranked (id, hit) lists with reciprocal rank fusion.
+    
+    Each id scores sum(1 / (RRF_K + rank)) over the lists it appears in;
+    a hit found by several lists is kept once, with the fields of the list
+    that returned it first.
+    
+    Args:
+        hit_lists: Ranked lists of (chunk id, hit dict), best first
+        k: Number of fused results to return
+        
+    Returns:
+        Top k hits with 'id', 'content', 'metadata', 'relevance_score'
+        (0.0 if the first list to return it had none) and 'rrf_score'
+    """
+    fused: Dict[str, Dict] = {}
+    for hits in hit_lists:
+        for rank, (chunk_id, hit) in enumerate(hits, 1):
+            entry = fused.get(chunk_id)
+            if entry is None:
+                entry = fused[chunk_id] = {
+                    "id": chunk_id,
+                    "content": hit["content"],
+                    "metadata": hit["metadata"],
+                    "relevance_score": hit.get("relevance_score", 0.0),
+                    "rrf_score": 0.0
+                }
+            entry["rrf_score"] += 1 / (RRF_K + rank)
+    
+    return sorted(fused.values(), key=lambda r: r["rrf_score"], reverse=True)[:k]
+
+
+class KeywordIndex:
+    """
+    BM25 index over the vector store's chunks.
+    
+    The corpus is loaded from the collection on first use, then kept
+    current with add/remove. BM25Okapi has no incremental updates, so every
+    change schedules a rebuild on a background thread; searches keep using
+    the previous index until the new one is swapped in.
+    
+    Adds and removes are keyed by chunk id and idempotent. Before the load
+    they are ignored (the load reads them from the collection); while the
+    load runs they are queued and replayed on top of what it read.
+    """
+    
+    def __init__(self):
+        # Current corpus, updated in place by add/remove: id -> (document, metadata, tokens)
+        self._corpus: Dict[str, Tuple[str, Dict, List[str]]] = {}
+        # Changes that arrive while the corpus is being loaded
+        self._pending: List[Tuple[str, list]] = []
+        self._loading = False
+        self._loaded = False
+        # (bm25, ids, documents, metadatas) that searches read; swapped whole.
+        # Versions count corpus changes, so an older build never replaces a newer one
+        self._snapshot: Optional[Tuple[BM25Okapi, List[str], List[str], List[Dict]]] = None
+        self._version = 0
+        self._snapshot_version = -1
+        self._ready = False
+        # Bumped by invalidate, so a load that started before it is not marked ready
+        self._epoch = 0
+        self._rebuild_pending = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # One worker, so rebuilds run in order and never overlap
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bm25")
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._ready
+    
+    def ensure_loaded(
+        self,
+        fetch: Callable[[], Tuple[List[str], List[str], List[Dict]]]
+    ) -> None:
+        """
+        Load the corpus once, synchronously; concurrent callers wait for it.
+        
+        Args:
+            fetch: Returns (ids, documents, metadatas) of every chunk
+        """
+        if self._ready:
+            return
+        with self._load_lock:
+            if self._ready:
+                return
+            with self._lock:
+                self._loading = True
+                epoch = self._epoch
+            try:
+                ids, documents, metadatas = fetch()
+                corpus = {
+                    chunk_id: (document, metadata, tokenize(document))
+                    for chunk_id, document, metadata in zip(ids, documents, metadatas)
+                }
+            except BaseException:
+                with self._lock:
+                    self._loading = False
+                    self._pending = []
+                raise
+            with self._lock:
+                for apply, args in self._pending:
+                    apply(corpus, *args)
+                self._pending = []
+                self._corpus = corpus
+                self._loading = False
+                self._loaded = True
+                self._version += 1
+                version, rows = self._version, list(corpus.items())
+            self._publish(version, self._build(rows))
+            self._ready = epoch == self._epoch
+    
+    def invalidate(self) -> None:
+        """Reload the corpus on the next ensure_loaded (another process changed the collection)"""
+        with self._lock:
+            self._epoch += 1
+            self._ready = False
+    
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict]) -> None:
+        """Add chunks and rebuild in the background"""
+        if not (self._loading or self._loaded):
+            return  # Nothing to tokenize for; the load will read these chunks
+        entries = [
+            (chunk_id, (document, metadata, tokenize(document)))
+            for chunk_id, document, metadata in zip(ids, documents, metadatas)
+        ]
+        self._change(self._add_entries, entries)
+    
+    def remove(self, ids: List[str]) -> None:
+        """Drop chunks by id and rebuild in the background"""
+        self._change(self._remove_ids, list(ids))
+    
+    @staticmethod
+    def _add_entries(corpus: Dict, entries: List) -> None:
+        for chunk_id, entry in entries:
+            corpus.setdefault(chunk_id, entry)
+    
+    @staticmethod
+    def _remove_ids(corpus: Dict, ids: List[str]) -> None:
+        for chunk_id in ids:
+            corpus.pop(chunk_id, None)
+    
+    def _change(self, apply: Callable, *args) -> None:
+        with self._lock:
+            if self._loading:
+                self._pending.append((apply, args))
+            elif self._loaded:
+                apply(self._corpus, *args)
+                self._version += 1
+                # One queued rebuild picks up all changes before it runs
+                if not self._rebuild_pending:
+                    self._rebuild_pending = True
+                    self._executor.submit(self._rebuild)
+    
+    def _rebuild(self) -> None:
+        with self._lock:
+            self._rebuild_pending = False
+            version, rows = self._version, list(self._corpus.items())
+        self._publish(version, self._build(rows))
+    
+    def _publish(self, version: int, snapshot) -> None:
+        with self._lock:
+            if version > self._snapshot_version:
+                self._snapshot, self._snapshot_version = snapshot, version
+    
+    @staticmethod
+    def _build(rows: List[Tuple[str, Tuple[str, Dict, List[str]]]]):
+        if not rows:
+            return None
+        ids = [chunk_id for chunk_id, _ in rows]
+        documents = [document for _, (document, _, _) in rows]
+        metadatas = [metadata for _, (_, metadata, _) in rows]
+        return BM25Okapi([tokens for _, (_, _, tokens) in rows]), ids, documents, metadatas
+    
+    def search(self, query: str, n: int) -> List[Tuple[str, Dict]]:
+        """
+        Find the chunks that best match the query terms.
+        
+        Returns:
+            Up to `n` (chunk id, result dict) pairs, best first; result
+            dicts have 'id', 'content' and 'metadata' like vector search results
+        """
+        tokens = tokenize(query)
+        snapshot = self._snapshot
+        if snapshot is None or not tokens:
+            return []
+        
+        bm25, ids, documents, metadatas = snapshot
+        scores = bm25.get_scores(tokens)
+        top = scores.argsort()[::-1][:n]
+        return [
+            (ids[i], {"id": ids[i], "content": documents[i], "metadata": metadatas[i]})
+            for i in top
+            if scores[i] > 0
+        ]
@@ -1,15 +1,35 @@
 """
 DeepSeek LLM wrapper using LangChain
 """
+from collections import OrderedDict
+from functools import lru_cache
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, AsyncIterator, Mapping, Sequence, Tuple
 
 from backend.config import get_settings
 
 settings = get_settings()
 
+# Exact-match response cache for callers that pass a cache_key
+_RESPONSE_CACHE_SIZE = 1024
+_response_cache: "OrderedDict[Tuple, str]" = OrderedDict()
 
+# One keep-alive HTTP/2 client shared by every LLM instance
+_http_async_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+    timeout=httpx.Timeout(60.0, connect=10.0)
+)
+
+
+async def close_http_client() -> None:
+    """Close the shared LLM HTTP client's pooled connections (app shutdown)"""
+    await _http_async_client.aclose()
+
+
+@lru_cache(maxsize=8)
 def get_llm(
     temperature: float = 0.7,
     max_tokens: int = 2048,
@@ -18,7 +38,9 @@ def get_llm(
     """
     Get a DeepSeek LLM instance.
     
-    DeepSeek API is compatible with OpenAI API format.
+    DeepSeek API is compatible with OpenAI API format. Instances are
+    cached per (temperature, max_tokens, model) and share one HTTP client,
+    so connections and TLS sessions are reused across requests.
     
     Args:
         temperature: Sampling temperature (0-1)
@@ -33,40 +55,85 @@ def get_llm(
         api_key=settings.deepseek_api_key,
         base_url=settings.deepseek_base_url,
         temperature=temperature,
-        max_tokens=max_tokens
+        max_tokens=max_tokens,
+        http_async_client=_http_async_client
     )
 
 
 async def chat_completion(
-    messages: List[Dict[str, str]],
+    messages: Sequence[Mapping[str, str]],
     temperature: float = 0.7,
     max_tokens: int = 2048,
-    model: str = "deepseek-chat"
+    model: str = "deepseek-chat",
+    cache_key: Optional[str] = None
 ) -> str:
     """
     Simple chat completion function.
     
     Args:
-        messages: List of message dicts with 'role' and 'content'
+        messages: Sequence of message mappings with 'role' and 'content'
         temperature: Sampling temperature
         max_tokens: Maximum tokens
         model: Model name
+        cache_key: Optional key identifying the messages; responses for the
+            same key and generation settings are served from memory
     
     Returns:
         Generated response text
     """
+    if cache_key is not None:
+        key = (cache_key, model, temperature, max_tokens)
+        cached = _response_cache.get(key)
+        if cached is not None:
+            _response_cache.move_to_end(key)
+            return cached
+    
+    llm = get_llm(temperature=temperature, max_tokens=max_tokens, model=model)
+    
+    response = await llm.ainvoke(_to_langchain_messages(messages))
+    
+    if cache_key is not None:
+        _response_cache[key] = response.content
+        if len(_response_cache) > _RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+    
+    return response.content
+
+
+async def stream_chat_completion(
+    messages: Sequence[Mapping[str, str]],
+    temperature: float = 0.7,
+    max_tokens: int = 2048,
+    model: str = "deepseek-chat"
+) -> AsyncIterator[str]:
+    """
+    Streaming chat completion.
+    
+    Args:
+        messages: Sequence of message mappings with 'role' and 'content'
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens
+        model: Model name
+    
+    Yields:
+        Response text chunks as they are generated
+    """
     llm = get_llm(temperature=temperature, max_tokens=max_tokens, model=model)
     
-    # Convert to LangChain message format
+    async for chunk in llm.astream(_to_langchain_messages(messages)):
+        if chunk.content:
+            yield chunk.content
+
+
+def _to_langchain_messages(messages: Sequence[Mapping[str, str]]) -> List:
+    """Convert message dicts to LangChain message format"""
     lc_messages = []
     for msg in messages:
         if msg["role"] == "system":
             lc_messages.append(SystemMessage(content=msg["content"]))
         else:
             lc_messages.append(HumanMessage(content=msg["content"]))
-    
-    response = await llm.ainvoke(lc_messages)
-    return response.content
+    return lc_messages
 
 
 # Pre-configured LLM instances
@@ -1,6 +1,7 @@
 """
 Prompt templates for various AI Tutor tasks
 """
+from string import Template
 
 # System prompt for RAG-based Q&A
 RAG_SYSTEM_PROMPT = """你是一个专业的《数据结构》课程智能助教，名叫 EduMentor。
@@ -98,3 +99,21 @@ KNOWLEDGE_EXTRACTION_PROMPT = """分析以下学生提问，识别涉及的《
 ```json
 ["知识点1", "知识点2"]
 ```"""
+
+
+def _compile(template: str, *fields: str) -> Template:
+    """Convert a str.format-style prompt into a precompiled string.Template"""
+    template = template.replace("$", "$$").replace("{{", "{").replace("}}", "}")
+    for field in fields:
+        template = template.replace("{" + field + "}", "$" + field)
+    return Template(template)
+
+
+# Template compiled once at import; filling it never re-parses the text
+_TMPL_RAG = _compile(RAG_SYSTEM_PROMPT, "context")
+
+
+def render_rag(context: str) -> str:
+    """Fill the RAG system prompt with retrieved context"""
+    return _TMPL_RAG.substitute(context=context)
+
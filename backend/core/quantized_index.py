@@ -0,0 +1,134 @@
+"""
+In-memory int8 / binary quantized copy of the chunk embeddings
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Set bits per byte value, for Hamming distances over packed codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Rows of int8 codes scored per BLAS call
+_INT8_BLOCK_ROWS = 4096
+
+
+class QuantizedIndex:
+    """
+    Compressed embedding matrix for a brute-force candidate scan.
+
+    - "int8": each component scaled to [-127, 127] (4x smaller than float32),
+      scored by the dot product of the codes
+    - "binary": one sign bit per component (32x smaller), scored by
+      Hamming distance
+
+    Scores are approximate; callers oversample and re-rank the candidates
+    with the full-precision vectors. Like the keyword index, it is rebuilt
+    on a background thread after the collection changes; until the rebuild
+    catches up, `is_stale` tells callers to search exactly instead.
+    """
+
+    def __init__(self, mode: str):
+        if mode not in ("int8", "binary"):
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.mode = mode
+        self._ids: List[str] = []
+        self._codes: Optional[np.ndarray] = None
+        # Bumped by every change; the codes reflect _built_generation
+        self._generation = 0
+        self._built_generation = -1
+        self._rebuild_pending = False
+        self._lock = threading.Lock()
+        # One worker, so rebuilds run in order and never overlap
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quantize")
+
+    def mark_stale(self) -> None:
+        """Record a collection change; the index is stale until rebuilt after it"""
+        with self._lock:
+            self._generation += 1
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_generation != self._generation
+
+    def schedule_rebuild(self, batches: Callable[[], Iterable[Tuple[List[str], Any]]]) -> None:
+        """
+        Rebuild on the background worker, unless fresh or already queued.
+
+        Args:
+            batches: Returns the (ids, embeddings) pages to quantize
+        """
+        with self._lock:
+            if self._rebuild_pending or not self.is_stale:
+                return
+            self._rebuild_pending = True
+        self._executor.submit(self._run_rebuild, batches)
+
+    def _run_rebuild(self, batches: Callable[[], Iterable[Tuple[List[str], Any]]]) -> None:
+        try:
+            self.rebuild(batches())
+        except Exception:
+            # Searches stay exact; the next one schedules another attempt
+            logger.exception("Quantized index rebuild failed")
+        finally:
+            with self._lock:
+                self._rebuild_pending = False
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.mode == "binary":
+            return np.packbits(vectors > 0, axis=-1)
+        # Embeddings are L2-normalized, so components already lie in [-1, 1]
+        return np.clip(np.rint(vectors * 127), -127, 127).astype(np.int8)
+
+    def rebuild(self, batches: Iterable[Tuple[List[str], Any]]) -> None:
+        """
+        Quantize embeddings batch by batch, replacing the previous contents.
+
+        Changes marked while it runs leave the index stale, so they are
+        picked up by the next rebuild rather than lost.
+
+        Args:
+            batches: (ids, embeddings) pairs; only one batch of float32
+                vectors needs to be in memory at a time
+        """
+        with self._lock:
+            generation = self._generation
+        ids: List[str] = []
+        codes = []
+        for batch_ids, embeddings in batches:
+            if len(batch_ids):
+                ids.extend(batch_ids)
+                codes.append(self._encode(np.asarray(embeddings, dtype=np.float32)))
+        with self._lock:
+            self._ids = ids
+            self._codes = np.concatenate(codes) if codes else None
+            self._built_generation = generation
+
+    def search(self, query_vec: np.ndarray, n: int) -> List[str]:
+        """
+        Approximate nearest neighbours of a query.
+
+        Returns:
+            Up to `n` chunk ids, best first
+        """
+        with self._lock:
+            if self._codes is None:
+                return []
+            query_code = self._encode(np.asarray(query_vec, dtype=np.float32))
+            if self.mode == "binary":
+                scores = -_POPCOUNT[self._codes ^ query_code].sum(axis=1, dtype=np.int32)
+            else:
+                # Upcast block by block so only a small float32 buffer is live
+                query = query_code.astype(np.float32)
+                scores = np.empty(len(self._codes), dtype=np.float32)
+                for start in range(0, len(self._codes), _INT8_BLOCK_ROWS):
+                    block = self._codes[start:start + _INT8_BLOCK_ROWS]
+                    scores[start:start + len(block)] = block.astype(np.float32) @ query
+
+            n = min(n, len(scores))
+            top = np.argpartition(-scores, n - 1)[:n]
+            top = top[np.argsort(-scores[top])]
+            return [self._ids[i] for i in top]
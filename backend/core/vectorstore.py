@@ -2,18 +2,75 @@
 ChromaDB vector store management
 """
 import os
+import json
+import time
+import hashlib
+import threading
+from collections import defaultdict
 from typing import List, Dict, Optional, Any
-from datetime import datetime
+import numpy as np
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 from langchain_chroma import Chroma
-from langchain_core.documents import Document
 
 from backend.config import get_settings
 from backend.core.embeddings import get_embeddings_for_langchain
+from backend.core.embedding_cache import embed_with_cache, get_persistent_embedding_cache
+from backend.core.document_index import DocumentIndex
+from backend.core.keyword_index import KeywordIndex, reciprocal_rank_fuse
+from backend.core.quantized_index import QuantizedIndex
+from backend.utils.query_cache import QueryCache
 
 settings = get_settings()
 
+# For k at or above this, candidates are re-ranked exactly with NumPy
+RERANK_MIN_K = 20
+RERANK_OVERSAMPLE = 2
+
+# Candidates fetched per result from the quantized index before exact re-ranking
+QUANTIZED_OVERSAMPLE = 4
+# Chunks whose float32 embeddings are loaded at once while (re)building it
+QUANTIZE_PAGE_SIZE = 2048
+
+# Length of the content preview stored with each chunk for source references
+PREVIEW_CHARS = 150
+
+
+def _rerank_numpy(query_vec: np.ndarray, cand_matrix: np.ndarray, k: int):
+    """
+    Exact cosine re-rank of candidate embeddings.
+    
+    Args:
+        query_vec: Query embedding [dim]
+        cand_matrix: Candidate embeddings [n, dim]
+        k: Number of results to keep
+        
+    Returns:
+        Tuple of (indices into cand_matrix, cosine similarities), best first
+    """
+    # One sqrt over the product of squared norms instead of two norms
+    sims = cand_matrix @ query_vec / np.sqrt(
+        np.einsum("ij,ij->i", cand_matrix, cand_matrix) * np.vdot(query_vec, query_vec)
+    )
+    k = min(k, len(sims))
+    top = np.argpartition(-sims, k - 1)[:k]
+    top = top[np.argsort(-sims[top])]
+    return top, sims[top]
+
+
+def _quantize(vectors) -> np.ndarray:
+    """
+    Round embeddings to the configured storage precision.
+    
+    Chroma accepts float32 only, so float16-rounded values are handed
+    over as float32; documents and queries go through the same rounding
+    to keep their distances consistent.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if settings.embedding_dtype == "float16":
+        vectors = vectors.astype(np.float16).astype(np.float32)
+    return vectors
+
 
 class VectorStoreManager:
     """Manage ChromaDB vector store operations"""
@@ -22,6 +79,16 @@ class VectorStoreManager:
     _client = None
     _collection = None
     _langchain_store = None
+    _documents: Optional[DocumentIndex] = None
+    _keyword_index = KeywordIndex()
+    _quantized_index: Optional[QuantizedIndex] = (
+        QuantizedIndex(settings.vector_quantization)
+        if settings.vector_quantization != "none" else None
+    )
+    _search_cache = QueryCache(max_size=2000, ttl=300)
+    # Knowledge base generation the caches and indexes above reflect
+    _generation: Optional[int] = None
+    _generation_lock = threading.Lock()
     
     COLLECTION_NAME = "ai_tutor_knowledge"
     
@@ -55,6 +122,45 @@ class VectorStoreManager:
             name=self.COLLECTION_NAME,
             metadata={"description": "AI Tutor course knowledge base"}
         )
+        
+        # Per-document side table; backfill it once for existing collections
+        self._documents = DocumentIndex(persist_dir)
+        if self._documents.is_empty() and self._collection.count():
+            results = self._collection.get(include=["metadatas"])
+            self._documents.rebuild(results["metadatas"] or [])
+        self._generation = self._documents.generation()
+    
+    def generation(self) -> int:
+        """
+        Current knowledge base generation, shared by all worker processes.
+        
+        Every add and delete bumps it in the document index. When it has
+        moved past the value this process last saw, another worker changed
+        the collection, so the search cache is dropped, the keyword index
+        reloads and the quantized index rebuilds. Callers keying their own
+        caches on the result get the same invalidation.
+        """
+        current = self._documents.generation()
+        if current != self._generation:
+            with self._generation_lock:
+                if current != self._generation:
+                    self._search_cache.clear()
+                    self._keyword_index.invalidate()
+                    self._mark_quantized_stale()
+                    self._generation = current
+        return current
+    
+    def _applied_locally(self, generation: int) -> None:
+        """
+        Record a generation produced by this process's own add/delete.
+        
+        Its caches and indexes were already updated in place; if another
+        worker's change slipped in between, the next `generation()` call
+        still sees a gap and drops everything.
+        """
+        with self._generation_lock:
+            if self._generation == generation - 1:
+                self._generation = generation
     
     def get_langchain_store(self) -> Chroma:
         """Get LangChain-compatible Chroma store"""
@@ -69,7 +175,8 @@ class VectorStoreManager:
     def add_documents(
         self,
         chunks: List[Dict],
-        document_id: str
+        document_id: str,
+        metadata: Optional[Dict] = None
     ) -> int:
         """
         Add document chunks to the vector store.
@@ -77,6 +184,7 @@ class VectorStoreManager:
         Args:
             chunks: List of chunk dicts with 'content' and 'metadata'
             document_id: Unique identifier for the source document
+            metadata: Extra metadata applied to every chunk (e.g. 'source')
             
         Returns:
             Number of chunks added
@@ -84,25 +192,48 @@ class VectorStoreManager:
         if not chunks:
             return 0
         
-        # Prepare documents for LangChain
-        documents = []
-        for i, chunk in enumerate(chunks):
-            metadata = chunk.get("metadata", {})
-            metadata["document_id"] = document_id
-            metadata["chunk_id"] = f"{document_id}_{i}"
-            metadata["added_at"] = datetime.now().isoformat()
-            
-            doc = Document(
-                page_content=chunk["content"],
-                metadata=metadata
+        # Prepare chunk ids, texts and metadata; all chunks share one epoch timestamp
+        added_at = int(time.time())
+        ids = [f"{document_id}_{i}" for i in range(len(chunks))]
+        texts = [chunk["content"] for chunk in chunks]
+        base = {**(metadata or {}), "document_id": document_id, "added_at": added_at}
+        metadatas = [
+            {
+                **chunk.get("metadata", {}),
+                **base,
+                "chunk_id": chunk_id,
+                "preview": text[:PREVIEW_CHARS] + "..."
+            }
+            for chunk_id, chunk, text in zip(ids, chunks, texts)
+        ]
+        
+        # Embed all uncached chunks in one batched call, then insert them in
+        # as few collection calls as Chroma's batch size limit allows
+        embeddings = _quantize(get_persistent_embedding_cache().embed_documents(texts)).tolist()
+        batch_size = self._client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self._collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                metadatas=metadatas[start:end],
+                documents=texts[start:end]
             )
-            documents.append(doc)
         
-        # Add to vector store
-        store = self.get_langchain_store()
-        store.add_documents(documents)
+        generation = self._documents.upsert(
+            document_id,
+            metadatas[0].get("source", "Unknown"),
+            added_at,
+            len(ids)
+        )
+        
+        # Cached search results no longer reflect the collection
+        self._search_cache.clear()
+        self._keyword_index.add(ids, texts, metadatas)
+        self._mark_quantized_stale()
+        self._applied_locally(generation)
         
-        return len(documents)
+        return len(texts)
     
     def search(
         self,
@@ -113,35 +244,258 @@ class VectorStoreManager:
         """
         Search for similar documents.
         
+        Results are cached for a few minutes per (query, k, filter) and the
+        cache is cleared whenever documents are added or deleted.
+        
         Args:
             query: Search query text
             k: Number of results to return
             filter_dict: Optional metadata filter
             
         Returns:
-            List of search results with content and metadata
+            List of search results with Chroma id, content and metadata
+        """
+        self.generation()  # Drops state made stale by other workers
+        cache_key = self._search_cache_key(query, k, filter_dict)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Repeated queries reuse their embedding instead of re-encoding
+        query_vec = embed_with_cache(query)
+        
+        if self._quantized_index is not None and not filter_dict:
+            formatted = self._search_quantized(query_vec, k)
+            self._search_cache.set(cache_key, formatted)
+            return formatted
+        
+        if k >= RERANK_MIN_K:
+            formatted = self._search_reranked(query_vec, k, filter_dict)
+            self._search_cache.set(cache_key, formatted)
+            return formatted
+        
+        formatted = self._query_collection([query_vec], k, filter_dict)[0]
+        self._search_cache.set(cache_key, formatted)
+        return formatted
+    
+    def batch_search(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filter_dict: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        Search for several queries at once.
+        
+        Cached queries are answered directly. The rest are embedded like
+        `search` does (query embedding cache) and looked up in one
+        collection query, so each query gets exactly the results `search`
+        would return and both share cache entries.
+        
+        Args:
+            queries: Search query texts
+            k: Number of results per query
+            filter_dict: Optional metadata filter applied to all queries
+            
+        Returns:
+            One result list per query, in the same order
         """
-        store = self.get_langchain_store()
+        if k >= RERANK_MIN_K or (self._quantized_index is not None and not filter_dict):
+            # These paths refine per query; search() handles them
+            return [self.search(q, k=k, filter_dict=filter_dict) for q in queries]
+        
+        self.generation()
+        results: List[Optional[List[Dict]]] = [None] * len(queries)
+        keys = [self._search_cache_key(q, k, filter_dict) for q in queries]
+        
+        misses = []
+        for i, key in enumerate(keys):
+            results[i] = self._search_cache.get(key)
+            if results[i] is None:
+                misses.append(i)
         
-        # Perform similarity search with scores
-        if filter_dict:
-            results = store.similarity_search_with_score(
-                query, k=k, filter=filter_dict
+        if misses:
+            rows = self._query_collection(
+                [embed_with_cache(queries[i]) for i in misses], k, filter_dict
             )
-        else:
-            results = store.similarity_search_with_score(query, k=k)
-        
-        # Format results
-        formatted = []
-        for doc, score in results:
-            formatted.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "relevance_score": 1 - score  # Convert distance to similarity
-            })
+            for i, formatted in zip(misses, rows):
+                self._search_cache.set(keys[i], formatted)
+                results[i] = formatted
+        
+        return results
+    
+    def _query_collection(
+        self,
+        query_vecs: List[np.ndarray],
+        k: int,
+        filter_dict: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        Nearest chunks for each query vector, in one collection query.
+        
+        Returns:
+            One result list per query vector; each result carries the
+            Chroma 'id' alongside content, metadata and relevance_score
+        """
+        response = self._collection.query(
+            query_embeddings=_quantize(np.vstack(query_vecs)).tolist(),
+            n_results=k,
+            where=filter_dict or None,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                {
+                    "id": chunk_id,
+                    "content": content,
+                    "metadata": metadata,
+                    "relevance_score": 1 - distance  # Convert distance to similarity
+                }
+                for chunk_id, content, metadata, distance in zip(
+                    response["ids"][row],
+                    response["documents"][row],
+                    response["metadatas"][row],
+                    response["distances"][row]
+                )
+            ]
+            for row in range(len(query_vecs))
+        ]
+    
+    @staticmethod
+    def _search_cache_key(
+        query: str,
+        k: int,
+        filter_dict: Optional[Dict],
+        mode: str = "vector"
+    ) -> bytes:
+        """Cache key for a search call"""
+        return hashlib.sha256(
+            (mode + "\0" + query + str(k) + json.dumps(filter_dict, sort_keys=True)).encode()
+        ).digest()
+    
+    def hybrid_search(self, query: str, k: int = 5) -> List[Dict]:
+        """
+        Search with vector similarity and BM25 keywords, fused by rank.
+        
+        Both retrievers return 2k candidates, fused with reciprocal rank
+        fusion and cut to the top k. Keyword matches catch exact terms
+        (identifiers, names) that embeddings blur, so a smaller k keeps the
+        same recall.
+        
+        Args:
+            query: Search query text
+            k: Number of results to return
+            
+        Returns:
+            Results like `search`; 'relevance_score' is the vector
+            similarity (0.0 for keyword-only hits) and 'rrf_score' the fused score
+        """
+        self.generation()
+        cache_key = self._search_cache_key(query, k, None, mode="hybrid")
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Once per process; later adds/deletes update the index in place
+        self._keyword_index.ensure_loaded(self._fetch_keyword_corpus)
+        
+        # Both lists are keyed by Chroma id, so a chunk found twice is fused once
+        vector_hits = [(r["id"], r) for r in self.search(query, k=k * 2)]
+        keyword_hits = self._keyword_index.search(query, n=k * 2)
         
+        formatted = reciprocal_rank_fuse((vector_hits, keyword_hits), k)
+        self._search_cache.set(cache_key, formatted)
         return formatted
     
+    def _fetch_keyword_corpus(self):
+        """(ids, documents, metadatas) of every chunk, for loading the keyword index"""
+        results = self._collection.get(include=["documents", "metadatas"])
+        return results["ids"], results["documents"], results["metadatas"]
+    
+    def _search_reranked(
+        self,
+        query_vec: np.ndarray,
+        k: int,
+        filter_dict: Optional[Dict] = None
+    ) -> List[Dict]:
+        """Over-fetch approximate neighbours, then re-rank them exactly"""
+        results = self._collection.query(
+            query_embeddings=[_quantize(query_vec).tolist()],
+            n_results=k * RERANK_OVERSAMPLE,
+            where=filter_dict or None,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        
+        if not results["ids"] or not len(results["ids"][0]):
+            return []
+        
+        cand_matrix = np.asarray(results["embeddings"][0], dtype=np.float32)
+        top, sims = _rerank_numpy(query_vec, cand_matrix, k)
+        
+        ids = results["ids"][0]
+        documents = results["documents"][0]
+        metadatas = results["metadatas"][0]
+        return [
+            {
+                "id": ids[i],
+                "content": documents[i],
+                "metadata": metadatas[i],
+                # Same scale as the default path: 1 - squared L2 distance of unit vectors
+                "relevance_score": float(2 * sim - 1)
+            }
+            for i, sim in zip(top, sims)
+        ]
+    
+    def _mark_quantized_stale(self) -> None:
+        """Mark the quantized index out of date, if enabled"""
+        if self._quantized_index is not None:
+            self._quantized_index.mark_stale()
+    
+    def _iter_embeddings(self):
+        """Yield (ids, embeddings) pages of the collection, QUANTIZE_PAGE_SIZE at a time"""
+        offset = 0
+        while True:
+            page = self._collection.get(
+                include=["embeddings"], limit=QUANTIZE_PAGE_SIZE, offset=offset
+            )
+            if not page["ids"]:
+                return
+            yield page["ids"], page["embeddings"]
+            offset += len(page["ids"])
+    
+    def _search_quantized(self, query_vec: np.ndarray, k: int) -> List[Dict]:
+        """Scan the quantized embeddings for candidates, then re-rank them exactly"""
+        if self._quantized_index.is_stale:
+            # Search Chroma directly until the background rebuild catches up
+            self._quantized_index.schedule_rebuild(self._iter_embeddings)
+            if k >= RERANK_MIN_K:
+                return self._search_reranked(query_vec, k)
+            return self._query_collection([query_vec], k)[0]
+        
+        candidate_ids = self._quantized_index.search(query_vec, k * QUANTIZED_OVERSAMPLE)
+        if not candidate_ids:
+            return []
+        
+        results = self._collection.get(
+            ids=candidate_ids,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        cand_matrix = np.asarray(results["embeddings"], dtype=np.float32)
+        top, sims = _rerank_numpy(query_vec, cand_matrix, k)
+        
+        ids = results["ids"]
+        documents = results["documents"]
+        metadatas = results["metadatas"]
+        return [
+            {
+                "id": ids[i],
+                "content": documents[i],
+                "metadata": metadatas[i],
+                "relevance_score": float(2 * sim - 1)
+            }
+            for i, sim in zip(top, sims)
+        ]
+    
     def search_with_sources(
         self,
         query: str,
@@ -159,24 +513,19 @@ class VectorStoreManager:
         """
         results = self.search(query, k)
         
-        # Group by source
-        sources = {}
+        # Group chunk previews by (source, page), keeping first-seen order
+        grouped = defaultdict(list)
         for r in results:
-            source = r["metadata"].get("source", "Unknown")
-            page = r["metadata"].get("page", "N/A")
-            key = f"{source} (第{page}页)"
-            
-            if key not in sources:
-                sources[key] = {
-                    "source": source,
-                    "page": page,
-                    "chunks": []
-                }
-            sources[key]["chunks"].append(r["content"][:200] + "...")
+            metadata = r["metadata"]
+            key = (metadata.get("source", "Unknown"), metadata.get("page", "N/A"))
+            grouped[key].append(r["content"][:200] + "...")
         
         return {
             "results": results,
-            "sources": list(sources.values())
+            "sources": [
+                {"source": source, "page": page, "chunks": chunks}
+                for (source, page), chunks in grouped.items()
+            ]
         }
     
     def delete_document(self, document_id: str) -> int:
@@ -196,47 +545,27 @@ class VectorStoreManager:
         
         if results and results["ids"]:
             self._collection.delete(ids=results["ids"])
+            generation = self._documents.delete(document_id)
+            self._search_cache.clear()
+            self._keyword_index.remove(results["ids"])
+            self._mark_quantized_stale()
+            self._applied_locally(generation)
             return len(results["ids"])
         
         return 0
     
     def get_stats(self) -> Dict:
         """Get vector store statistics"""
-        count = self._collection.count()
-        
-        # Get unique documents
-        results = self._collection.get(include=["metadatas"])
-        doc_ids = set()
-        if results and results["metadatas"]:
-            for meta in results["metadatas"]:
-                if meta and "document_id" in meta:
-                    doc_ids.add(meta["document_id"])
-        
+        total_documents, total_chunks = self._documents.stats()
         return {
-            "total_chunks": count,
-            "total_documents": len(doc_ids),
+            "total_chunks": total_chunks,
+            "total_documents": total_documents,
             "collection_name": self.COLLECTION_NAME
         }
     
     def list_documents(self) -> List[Dict]:
         """List all documents in the store"""
-        results = self._collection.get(include=["metadatas"])
-        
-        documents = {}
-        if results and results["metadatas"]:
-            for meta in results["metadatas"]:
-                if meta and "document_id" in meta:
-                    doc_id = meta["document_id"]
-                    if doc_id not in documents:
-                        documents[doc_id] = {
-                            "id": doc_id,
-                            "source": meta.get("source", "Unknown"),
-                            "chunk_count": 0,
-                            "added_at": meta.get("added_at", "Unknown")
-                        }
-                    documents[doc_id]["chunk_count"] += 1
-        
-        return list(documents.values())
+        return self._documents.list()
 
 
 def get_vector_store() -> VectorStoreManager:
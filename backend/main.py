@@ -1,20 +1,63 @@
 """
 FastAPI main application entry point
 """
-from fastapi import FastAPI
+try:
+    # C event loop; uvicorn also picks it up when installed (unavailable on Windows)
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.api import chat, knowledge, user, quiz
 from backend.config import get_settings
+from backend.core.embeddings import get_embedding_model
+from backend.core.llm import close_http_client
+from backend.core.vectorstore import get_vector_store
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def _warm_up():
+    """Load the embedding model and page in the vector index"""
+    get_embedding_model().embed_query("warmup")
+    get_vector_store().get_langchain_store().similarity_search("warmup", k=1)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up models at startup; release worker processes and connections at shutdown"""
+    # Pay model loading at startup instead of on the first request
+    try:
+        await asyncio.to_thread(_warm_up)
+    except Exception as e:
+        # Don't block startup; the first request will retry the lazy load
+        logger.warning("Model warm-up failed: %s", e)
+    yield
+    knowledge.shutdown_pdf_process_pool()
+    await close_http_client()
+
 
 app = FastAPI(
     title="AI Tutor API",
     description="基于大模型与RAG技术的个性化智能学习与助教系统",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse,  # Faster serialization, UTF-8 without escaping
+    lifespan=lifespan
 )
 
+# Cap upload bodies while they stream in, before they are spooled to disk.
+# Added first so the CORS middleware wraps it and its 413 carries CORS headers
+app.add_middleware(knowledge.UploadSizeLimitMiddleware, path="/api/knowledge/upload")
+
 # CORS middleware for Streamlit frontend
 app.add_middleware(
     CORSMiddleware,
@@ -49,3 +92,21 @@ async def health_check():
             "vectorstore": "pending"
         }
     }
+
+
+@app.api_route("/ping", methods=["GET", "HEAD"])
+async def ping():
+    """Liveness probe with an empty body, for cheap frontend polling"""
+    return Response(status_code=200)
+
+
+@app.get("/api/dashboard")
+async def dashboard():
+    """Health, knowledge base stats and document list in one response"""
+    # Both knowledge endpoints read Chroma in worker threads, so they overlap
+    health, stats, documents = await asyncio.gather(
+        health_check(),
+        knowledge.get_knowledge_base_stats(),
+        knowledge.list_documents()
+    )
+    return {"health": health, "stats": stats, "documents": documents}
@@ -0,0 +1,117 @@
+"""Initial schema
+
+The tables as the original models defined them (what create_all built
+before migrations existed); later model changes are in 0002.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-14 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(length=50), nullable=False),
+        sa.Column("email", sa.String(length=100), nullable=False),
+        sa.Column("hashed_password", sa.String(length=255), nullable=False),
+        sa.Column("display_name", sa.String(length=100), nullable=True),
+        sa.Column("avatar_url", sa.String(length=255), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_admin", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("last_login_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "chat_sessions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(length=36), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("title", sa.String(length=200), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_chat_sessions_id", "chat_sessions", ["id"])
+    op.create_index("ix_chat_sessions_session_id", "chat_sessions", ["session_id"], unique=True)
+
+    op.create_table(
+        "chat_messages",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("role", sa.String(length=20), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("sources", sa.JSON(), nullable=True),
+        sa.Column("has_rag_context", sa.Boolean(), nullable=True),
+        sa.Column("knowledge_points", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["session_id"], ["chat_sessions.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_chat_messages_id", "chat_messages", ["id"])
+
+    op.create_table(
+        "learning_profiles",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("total_questions", sa.Integer(), nullable=True),
+        sa.Column("total_sessions", sa.Integer(), nullable=True),
+        sa.Column("total_study_time_minutes", sa.Integer(), nullable=True),
+        sa.Column("knowledge_mastery", sa.JSON(), nullable=True),
+        sa.Column("weak_points", sa.JSON(), nullable=True),
+        sa.Column("total_quizzes", sa.Integer(), nullable=True),
+        sa.Column("total_quiz_score", sa.Float(), nullable=True),
+        sa.Column("quiz_history", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("last_active_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id")
+    )
+    op.create_index("ix_learning_profiles_id", "learning_profiles", ["id"])
+
+    op.create_table(
+        "knowledge_point_records",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("knowledge_point", sa.String(length=100), nullable=False),
+        sa.Column("category", sa.String(length=50), nullable=True),
+        sa.Column("interaction_type", sa.String(length=20), nullable=False),
+        sa.Column("related_message_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["related_message_id"], ["chat_messages.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_knowledge_point_records_id", "knowledge_point_records", ["id"])
+    op.create_index(
+        "ix_knowledge_point_records_knowledge_point",
+        "knowledge_point_records",
+        ["knowledge_point"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("knowledge_point_records")
+    op.drop_table("learning_profiles")
+    op.drop_table("chat_messages")
+    op.drop_table("chat_sessions")
+    op.drop_table("users")
@@ -0,0 +1,50 @@
+"""Chat history storage changes
+
+- chat_messages.sources: JSON -> TEXT (pre-serialized JSON string)
+- chat_messages.sources_blob: zlib-compressed sources above 1 KB
+- ix_sessions_user_updated / ix_msgs_session_id composite indexes
+
+Databases that create_all built from a newer model version already have
+some of these, so each step checks the live schema first.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-14 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {c["name"]: c for c in inspector.get_columns("chat_messages")}
+    message_indexes = {i["name"] for i in inspector.get_indexes("chat_messages")}
+    session_indexes = {i["name"] for i in inspector.get_indexes("chat_sessions")}
+
+    if not isinstance(columns["sources"]["type"], sa.Text):
+        op.alter_column(
+            "chat_messages", "sources",
+            existing_type=sa.JSON(), type_=sa.Text(), existing_nullable=True
+        )
+    if "sources_blob" not in columns:
+        op.add_column("chat_messages", sa.Column("sources_blob", mysql.MEDIUMBLOB(), nullable=True))
+    if "ix_msgs_session_id" not in message_indexes:
+        op.create_index("ix_msgs_session_id", "chat_messages", ["session_id", "id"])
+    if "ix_sessions_user_updated" not in session_indexes:
+        op.create_index("ix_sessions_user_updated", "chat_sessions", ["user_id", "updated_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sessions_user_updated", table_name="chat_sessions")
+    op.drop_index("ix_msgs_session_id", table_name="chat_messages")
+    op.drop_column("chat_messages", "sources_blob")
+    op.alter_column(
+        "chat_messages", "sources",
+        existing_type=sa.Text(), type_=sa.JSON(), existing_nullable=True
+    )
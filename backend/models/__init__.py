@@ -5,6 +5,11 @@ from backend.models.user import User
 from backend.models.chat_history import ChatSession, ChatMessage
 from backend.models.profile import LearningProfile, KnowledgePointRecord
 
+from sqlalchemy.orm import configure_mappers
+
+# All models are registered above, so resolve relationships once at import
+configure_mappers()
+
 __all__ = [
     "Base",
     "engine", 
@@ -2,7 +2,8 @@
 Chat history models for storing conversations
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON, Index, LargeBinary
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
 from sqlalchemy.orm import relationship
 
 from backend.models.database import Base
@@ -12,6 +13,11 @@ class ChatSession(Base):
     """Chat session/conversation model"""
     
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        # get_user_sessions: newest first per user, keyset on (updated_at, id)
+        # (existing databases: migration 0002)
+        Index("ix_sessions_user_updated", "user_id", "updated_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(36), unique=True, index=True, nullable=False)  # UUID
@@ -36,6 +42,11 @@ class ChatMessage(Base):
     """Individual chat message model"""
     
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # get_session_messages: per-session keyset pagination on id
+        # (existing databases: migration 0002)
+        Index("ix_msgs_session_id", "session_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False)
@@ -45,8 +56,10 @@ class ChatMessage(Base):
     role = Column(String(20), nullable=False)  # "user" or "assistant"
     content = Column(Text, nullable=False)
     
-    # RAG metadata
-    sources = Column(JSON, nullable=True)  # List of source references
+    # RAG metadata (sources was JSON and sources_blob absent before migration 0002)
+    sources = Column(Text, nullable=True)  # JSON-encoded list of source references
+    # zlib-compressed JSON when large; MEDIUMBLOB on MySQL (BLOB caps at 64 KB)
+    sources_blob = Column(LargeBinary().with_variant(MEDIUMBLOB, "mysql"), nullable=True)
     has_rag_context = Column(Boolean, default=False)
     
     # Knowledge points (for learning profile)
@@ -1,70 +1,76 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from contextlib import contextmanager
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
+from contextlib import asynccontextmanager
 
 from backend.config import get_settings
 
 settings = get_settings()
 
-# Create engine
-engine = create_engine(
-    settings.mysql_url,
-    pool_pre_ping=True,  # Test connection before using
-    pool_recycle=3600,   # Recycle connections after 1 hour
-    echo=False           # Set True for SQL debugging
+# Create async engine
+engine = create_async_engine(
+    settings.mysql_async_url,
+    pool_size=settings.mysql_pool_size,
+    max_overflow=settings.mysql_max_overflow,
+    pool_timeout=settings.mysql_pool_timeout,  # Wait for a free connection before erroring
+    pool_pre_ping=True,                        # Test connection before using
+    pool_recycle=settings.mysql_pool_recycle,  # Recycle connections after 1 hour
+    pool_use_lifo=True,                        # Reuse the most recently returned (warm) connection
+    echo=False                                 # Set True for SQL debugging
 )
 
 # Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False  # Keep attributes loaded after commit (no lazy IO)
+)
 
 # Base class for models
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
     """
     Dependency for FastAPI to get database session.
     
     Usage:
         @app.get("/items")
-        def get_items(db: Session = Depends(get_db)):
+        async def get_items(db: AsyncSession = Depends(get_db)):
             ...
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-@contextmanager
-def get_db_context():
+@asynccontextmanager
+async def get_db_context():
     """
     Context manager for database session.
     
     Usage:
-        with get_db_context() as db:
-            db.query(...)
+        async with get_db_context() as db:
+            await db.execute(...)
     """
-    db = SessionLocal()
-    try:
-        yield db
-        db.commit()
-    except Exception:
-        db.rollback()
-        raise
-    finally:
-        db.close()
+    async with SessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
 
 
-def init_db():
+async def init_db():
     """Create all tables"""
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
 
 
-def drop_db():
+async def drop_db():
     """Drop all tables (use with caution!)"""
-    Base.metadata.drop_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
@@ -2,21 +2,96 @@
 Chat history service for storing and retrieving conversations
 """
 import uuid
+import zlib
+import orjson
 from datetime import datetime
-from typing import Optional, List, Dict
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from typing import Optional, List, Dict, Tuple, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, desc, insert, func, or_, and_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 
 from backend.models.chat_history import ChatSession, ChatMessage
 
 
+# Statements built once at import; SQLAlchemy caches their compiled form
+_sessions = ChatSession.__table__
+_UPSERT_SESSION = mysql_insert(_sessions)
+_UPSERT_SESSION = _UPSERT_SESSION.on_duplicate_key_update(
+    # LAST_INSERT_ID(id) makes lastrowid report the existing row's id
+    id=func.last_insert_id(_sessions.c.id),
+    title=func.coalesce(_sessions.c.title, _UPSERT_SESSION.inserted.title),
+    updated_at=_UPSERT_SESSION.inserted.updated_at
+)
+_INSERT_MESSAGES = insert(ChatMessage.__table__)
+
+
+# Source lists larger than this are stored compressed in sources_blob
+SOURCES_COMPRESS_BYTES = 1024
+
+
+def _dump_sources(
+    sources: Optional[Union[str, List[Dict]]]
+) -> Tuple[Optional[str], Optional[bytes]]:
+    """
+    Encode sources as (sources, sources_blob) column values.
+    
+    Small lists are kept as JSON text; large ones are zlib-compressed into
+    the blob column. Already-encoded JSON strings are accepted as-is.
+    """
+    if not sources:
+        return None, None
+    raw = sources.encode() if isinstance(sources, str) else orjson.dumps(sources)
+    if len(raw) > SOURCES_COMPRESS_BYTES:
+        return None, zlib.compress(raw)
+    return raw.decode(), None
+
+
+def _load_sources(message: ChatMessage) -> List[Dict]:
+    """Decode a message's stored sources from whichever column holds them"""
+    if message.sources_blob:
+        return orjson.loads(zlib.decompress(message.sources_blob))
+    return orjson.loads(message.sources) if message.sources else []
+
+
+def _message_params(session_pk: int, row: Dict, now: datetime) -> Dict:
+    """Column values for inserting one message dict with _INSERT_MESSAGES"""
+    sources, sources_blob = _dump_sources(row.get("sources"))
+    return {
+        "session_id": session_pk,
+        "user_id": row.get("user_id"),
+        "role": row["role"],
+        "content": row["content"],
+        "sources": sources,
+        "sources_blob": sources_blob,
+        "has_rag_context": row.get("has_rag_context", False),
+        "knowledge_points": row.get("knowledge_points"),
+        "created_at": now
+    }
+
+
+def session_cursor(session: ChatSession) -> str:
+    """Keyset cursor for the sessions after `session` in get_user_sessions"""
+    return f"{session.updated_at.isoformat()}_{session.id}"
+
+
+def _parse_session_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(updated_at, id) from a session_cursor value; ValueError if malformed"""
+    updated_at, _, session_pk = cursor.rpartition("_")
+    return datetime.fromisoformat(updated_at), int(session_pk)
+
+
+def _session_title(content: str) -> str:
+    """Derive a session title from the first user message"""
+    return content[:50] + ("..." if len(content) > 50 else "")
+
+
 class ChatHistoryService:
     """Service for managing chat history"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def create_session(
+    async def create_session(
         self,
         user_id: Optional[int] = None,
         title: Optional[str] = None
@@ -28,50 +103,162 @@ class ChatHistoryService:
             title=title
         )
         self.db.add(session)
-        self.db.commit()
-        self.db.refresh(session)
+        await self.db.commit()
+        await self.db.refresh(session)
         return session
     
-    def get_session(self, session_id: str) -> Optional[ChatSession]:
+    async def get_session(self, session_id: str) -> Optional[ChatSession]:
         """Get session by UUID"""
-        return self.db.query(ChatSession).filter(
-            ChatSession.session_id == session_id
-        ).first()
+        result = await self.db.execute(
+            select(ChatSession).where(ChatSession.session_id == session_id)
+        )
+        return result.scalars().first()
     
-    def get_or_create_session(
+    async def get_or_create_session(
         self,
         session_id: Optional[str] = None,
         user_id: Optional[int] = None
     ) -> ChatSession:
         """Get existing session or create new one"""
         if session_id:
-            session = self.get_session(session_id)
+            session = await self.get_session(session_id)
             if session:
                 return session
         
-        return self.create_session(user_id=user_id)
+        return await self.create_session(user_id=user_id)
     
-    def add_message(
+    async def upsert_session(
+        self,
+        session_id: str,
+        user_id: Optional[int] = None,
+        first_message: Optional[str] = None
+    ) -> int:
+        """
+        Create the session or touch its updated_at in one statement.
+        
+        Args:
+            session_id: Session UUID
+            user_id: Owner of a newly created session
+            first_message: Used as the title if the session has none yet
+            
+        Returns:
+            Primary key of the session row
+        """
+        now = datetime.utcnow()
+        conn = await self.db.connection()
+        result = await conn.execute(_UPSERT_SESSION, {
+            "session_id": session_id,
+            "user_id": user_id,
+            "title": _session_title(first_message) if first_message else None,
+            "created_at": now,
+            "updated_at": now
+        })
+        return result.lastrowid
+    
+    async def add_messages_bulk(
+        self,
+        session_pk: int,
+        rows: List[Dict]
+    ) -> None:
+        """
+        Insert several messages with one multi-row INSERT and commit.
+        
+        Args:
+            session_pk: Primary key of the session (from upsert_session)
+            rows: Message dicts with 'role', 'content' and optionally
+                'user_id', 'sources' (list or JSON string), 'has_rag_context',
+                'knowledge_points'
+        """
+        now = datetime.utcnow()
+        params = [_message_params(session_pk, row, now) for row in rows]
+        conn = await self.db.connection()
+        await conn.execute(_INSERT_MESSAGES, params)
+        await self.db.commit()
+    
+    async def begin_exchange(
+        self,
+        session_id: str,
+        question: str,
+        user_id: Optional[int] = None
+    ) -> int:
+        """
+        Store the question and an empty assistant placeholder, then commit.
+        
+        Lets the rows be written while the answer is still streaming; the
+        placeholder is filled in by `finish_message`.
+        
+        Args:
+            session_id: Session UUID
+            question: User message
+            user_id: Optional user ID
+            
+        Returns:
+            Primary key of the placeholder assistant message
+        """
+        now = datetime.utcnow()
+        session_pk = await self.upsert_session(
+            session_id=session_id, user_id=user_id, first_message=question
+        )
+        conn = await self.db.connection()
+        await conn.execute(_INSERT_MESSAGES, _message_params(
+            session_pk, {"role": "user", "content": question, "user_id": user_id}, now
+        ))
+        result = await conn.execute(_INSERT_MESSAGES, _message_params(
+            session_pk, {"role": "assistant", "content": ""}, now
+        ))
+        await self.db.commit()
+        return result.lastrowid
+    
+    async def finish_message(
+        self,
+        message_id: int,
+        content: str,
+        sources: Optional[Union[str, List[Dict]]] = None,
+        has_rag_context: bool = False
+    ) -> None:
+        """Fill in a placeholder message created by `begin_exchange` and commit"""
+        sources, sources_blob = _dump_sources(sources)
+        await self.db.execute(
+            update(ChatMessage)
+            .where(ChatMessage.id == message_id)
+            .values(
+                content=content,
+                sources=sources,
+                sources_blob=sources_blob,
+                has_rag_context=has_rag_context
+            )
+        )
+        await self.db.commit()
+    
+    async def add_message(
         self,
         session_id: str,
         role: str,
         content: str,
         user_id: Optional[int] = None,
-        sources: Optional[List[Dict]] = None,
+        sources: Optional[Union[str, List[Dict]]] = None,
         has_rag_context: bool = False,
-        knowledge_points: Optional[List[str]] = None
+        knowledge_points: Optional[List[str]] = None,
+        commit: bool = True
     ) -> ChatMessage:
-        """Add a message to a session"""
-        session = self.get_session(session_id)
+        """
+        Add a message to a session.
+        
+        Pass `commit=False` for all but the last message of a turn so the
+        whole turn is written in one transaction.
+        """
+        session = await self.get_session(session_id)
         if not session:
             raise ValueError(f"Session {session_id} not found")
         
+        sources, sources_blob = _dump_sources(sources)
         message = ChatMessage(
             session_id=session.id,
             user_id=user_id,
             role=role,
             content=content,
             sources=sources,
+            sources_blob=sources_blob,
             has_rag_context=has_rag_context,
             knowledge_points=knowledge_points
         )
@@ -80,68 +267,113 @@ class ChatHistoryService:
         
         # Update session title from first user message
         if role == "user" and not session.title:
-            session.title = content[:50] + ("..." if len(content) > 50 else "")
+            session.title = _session_title(content)
         
         session.updated_at = datetime.utcnow()
         
-        self.db.commit()
-        self.db.refresh(message)
+        # Flush assigns message.id; expire_on_commit=False keeps the rest loaded
+        await self.db.flush()
+        if commit:
+            await self.db.commit()
         return message
     
-    def get_session_messages(
+    async def get_session_messages(
         self,
         session_id: str,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        before_id: Optional[int] = None
     ) -> List[ChatMessage]:
-        """Get all messages in a session"""
-        session = self.get_session(session_id)
+        """
+        Get messages in a session in chronological order.
+        
+        With `limit`, returns the newest `limit` messages whose id is below
+        `before_id` (keyset pagination on the primary key).
+        """
+        session = await self.get_session(session_id)
         if not session:
             return []
         
-        query = self.db.query(ChatMessage).filter(
-            ChatMessage.session_id == session.id
-        ).order_by(ChatMessage.created_at)
+        query = select(ChatMessage).where(ChatMessage.session_id == session.id)
+        
+        if before_id is not None:
+            query = query.where(ChatMessage.id < before_id)
         
         if limit:
-            query = query.limit(limit)
+            result = await self.db.execute(
+                query.order_by(ChatMessage.id.desc()).limit(limit)
+            )
+            return list(reversed(result.scalars().all()))
         
-        return query.all()
+        result = await self.db.execute(query.order_by(ChatMessage.id))
+        return list(result.scalars().all())
     
-    def get_user_sessions(
+    async def get_user_sessions(
         self,
         user_id: int,
-        limit: int = 20
+        limit: int = 20,
+        cursor: Optional[str] = None
     ) -> List[ChatSession]:
-        """Get user's chat sessions"""
-        return self.db.query(ChatSession).filter(
-            ChatSession.user_id == user_id
-        ).order_by(desc(ChatSession.updated_at)).limit(limit).all()
+        """
+        Get user's chat sessions, most recently updated first.
+        
+        `cursor` is `session_cursor()` of the last session of the previous
+        page. It carries that session's (updated_at, id) as they were when
+        the page was served, so a session that gets new messages between
+        page loads doesn't shift the page boundary.
+        
+        Raises:
+            ValueError: If `cursor` is malformed
+        """
+        query = select(ChatSession).where(ChatSession.user_id == user_id)
+        
+        if cursor is not None:
+            cursor_updated_at, cursor_id = _parse_session_cursor(cursor)
+            query = query.where(or_(
+                ChatSession.updated_at < cursor_updated_at,
+                and_(
+                    ChatSession.updated_at == cursor_updated_at,
+                    ChatSession.id < cursor_id
+                )
+            ))
+        
+        result = await self.db.execute(
+            query.order_by(desc(ChatSession.updated_at), desc(ChatSession.id)).limit(limit)
+        )
+        return list(result.scalars().all())
     
-    def delete_session(self, session_id: str) -> bool:
+    async def delete_session(self, session_id: str) -> bool:
         """Delete a session and all its messages"""
-        session = self.get_session(session_id)
+        session = await self.get_session(session_id)
         if not session:
             return False
         
         # Delete messages first
-        self.db.query(ChatMessage).filter(
-            ChatMessage.session_id == session.id
-        ).delete()
+        await self.db.execute(
+            delete(ChatMessage).where(ChatMessage.session_id == session.id)
+        )
         
         # Delete session
-        self.db.delete(session)
-        self.db.commit()
+        await self.db.delete(session)
+        await self.db.commit()
         return True
     
-    def get_session_history_formatted(self, session_id: str) -> List[Dict]:
+    async def get_session_history_formatted(
+        self,
+        session_id: str,
+        limit: Optional[int] = None,
+        before_id: Optional[int] = None
+    ) -> List[Dict]:
         """Get session messages formatted for display"""
-        messages = self.get_session_messages(session_id)
+        messages = await self.get_session_messages(
+            session_id, limit=limit, before_id=before_id
+        )
         
         return [
             {
+                "id": msg.id,
                 "role": msg.role,
                 "content": msg.content,
-                "sources": msg.sources or [],
+                "sources": _load_sources(msg),
                 "timestamp": msg.created_at.isoformat() if msg.created_at else None
             }
             for msg in messages
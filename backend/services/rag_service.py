@@ -1,14 +1,32 @@
 """
 RAG (Retrieval-Augmented Generation) service
 """
-from typing import List, Dict, Optional, AsyncGenerator
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+import asyncio
+from functools import lru_cache
+from typing import List, Dict, AsyncGenerator
+from langchain_core.messages import HumanMessage, SystemMessage
 
 from backend.core.llm import get_chat_llm
 from backend.core.vectorstore import get_vector_store
-from backend.core.prompts import RAG_SYSTEM_PROMPT
+from backend.core.prompts import render_rag
+from backend.utils.query_cache import QueryCache
+from backend.config import get_settings
+
+settings = get_settings()
+
+
+NO_CONTEXT_ANSWER = "抱歉，我在知识库中没有找到与您问题相关的内容。请确保已上传相关的课程资料，或尝试换一种方式提问。"
+
+# Upper bound on simultaneous LLM requests issued by query_batch
+MAX_CONCURRENT_LLM_CALLS = 32
+
+
+def _chunk_order_key(chunk: Dict):
+    """Sort key placing chunks in document order: (document_id, chunk index)"""
+    metadata = chunk["metadata"]
+    document_id = metadata.get("document_id", "")
+    _, _, index = metadata.get("chunk_id", "").rpartition("_")
+    return (document_id, int(index) if index.isdigit() else -1)
 
 
 class RAGService:
@@ -19,6 +37,12 @@ class RAGService:
     accurate, source-backed answers.
     """
     
+    # Retrieved chunks per (normalized question, k, hybrid, knowledge base
+    # generation); shared by all instances. The generation makes entries
+    # from before another worker's upload or delete unreachable; this
+    # worker's own changes also clear it through KnowledgeService
+    _retrieval_cache = QueryCache(max_size=1024, ttl=600)
+    
     def __init__(self):
         self.vector_store = get_vector_store()
         self.llm = get_chat_llm()
@@ -41,32 +65,115 @@ class RAGService:
             Dict with 'answer' and optionally 'sources'
         """
         # Step 1: Retrieve relevant context
-        search_results = self.vector_store.search_with_sources(question, k=k)
-        context_chunks = search_results["results"]
+        context_chunks = await self.retrieve_only(question, k=k)
+        
+        # Steps 2-4: Generate and format the answer
+        return await self.generate_with_context(
+            question, context_chunks, include_sources=include_sources
+        )
+    
+    @classmethod
+    def clear_retrieval_cache(cls) -> None:
+        """Drop cached retrieval results (call when the knowledge base changes)"""
+        cls._retrieval_cache.clear()
+    
+    async def query_batch(
+        self,
+        questions: List[str],
+        k: int = 5,
+        include_sources: bool = True
+    ) -> List[Dict]:
+        """
+        Answer several questions concurrently.
+        
+        Retrieval for all questions is one batched vector search (or, with
+        hybrid search enabled, the same per-question retrieval as `query`);
+        the LLM calls then run concurrently, at most `MAX_CONCURRENT_LLM_CALLS`
+        at a time.
         
+        Args:
+            questions: User questions
+            k: Number of context chunks to retrieve per question
+            include_sources: Whether to include source references
+            
+        Returns:
+            One result dict per question, in the same order
+        """
+        if not questions:
+            return []
+        
+        if settings.hybrid_search:
+            all_chunks = await asyncio.gather(*(self.retrieve_only(q, k=k) for q in questions))
+        else:
+            all_chunks = await asyncio.to_thread(self.vector_store.batch_search, questions, k)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+        
+        async def generate(question: str, chunks: List[Dict]) -> Dict:
+            async with semaphore:
+                return await self.generate_with_context(
+                    question, chunks, include_sources=include_sources
+                )
+        
+        return await asyncio.gather(*(
+            generate(question, chunks) for question, chunks in zip(questions, all_chunks)
+        ))
+    
+    async def retrieve_only(self, question: str, k: int = 5) -> List[Dict]:
+        """
+        Retrieve context chunks without generating an answer.
+        
+        Repeated questions (ignoring case and whitespace) are served from
+        an in-memory LRU cache while the knowledge base is unchanged;
+        otherwise the search runs in a worker thread so callers can overlap
+        it with other awaitables.
+        """
+        cache_key = (
+            " ".join(question.split()).lower(),
+            k,
+            settings.hybrid_search,
+            self.vector_store.generation()
+        )
+        cached = self._retrieval_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        chunks = await asyncio.to_thread(self.get_relevant_context, question, k)
+        self._retrieval_cache.set(cache_key, chunks)
+        return chunks
+    
+    async def generate_with_context(
+        self,
+        question: str,
+        context_chunks: List[Dict],
+        include_sources: bool = True
+    ) -> Dict:
+        """
+        Generate an answer from already retrieved chunks.
+        
+        Args:
+            question: User's question
+            context_chunks: Results from retrieve_only
+            include_sources: Whether to include source references
+            
+        Returns:
+            Dict with 'answer' and optionally 'sources'
+        """
         if not context_chunks:
             # No relevant context found
             return {
-                "answer": "抱歉，我在知识库中没有找到与您问题相关的内容。请确保已上传相关的课程资料，或尝试换一种方式提问。",
+                "answer": NO_CONTEXT_ANSWER,
                 "sources": [],
                 "has_context": False
             }
         
-        # Step 2: Format context
-        context = self._format_context(context_chunks)
+        # Step 2: Format context in a canonical chunk order, so queries that
+        # retrieve the same chunks send an identical prompt prefix and hit the
+        # provider's prompt (KV) cache instead of re-running prefill
+        context = self._format_context(sorted(context_chunks, key=_chunk_order_key))
         
         # Step 3: Generate answer with LLM
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", RAG_SYSTEM_PROMPT),
-            ("human", "{question}")
-        ])
-        
-        chain = prompt | self.llm | StrOutputParser()
-        
-        answer = await chain.ainvoke({
-            "context": context,
-            "question": question
-        })
+        response = await self.llm.ainvoke(self._rag_messages(context, question))
+        answer = response.content
         
         # Step 4: Format response
         result = {
@@ -75,10 +182,49 @@ class RAGService:
         }
         
         if include_sources:
-            result["sources"] = self._format_sources(context_chunks)
+            result["sources"] = self.format_sources(context_chunks)
         
         return result
     
+    async def query_stream(self, question: str, k: int = 5) -> AsyncGenerator[str, None]:
+        """
+        Answer a question using RAG, yielding answer text as it is generated.
+        
+        Args:
+            question: User's question
+            k: Number of context chunks to retrieve
+            
+        Yields:
+            Answer text chunks
+        """
+        context_chunks = await self.retrieve_only(question, k=k)
+        async for token in self.generate_stream(question, context_chunks):
+            yield token
+    
+    async def generate_stream(
+        self,
+        question: str,
+        context_chunks: List[Dict]
+    ) -> AsyncGenerator[str, None]:
+        """
+        Streaming counterpart of generate_with_context.
+        
+        Args:
+            question: User's question
+            context_chunks: Results from retrieve_only
+            
+        Yields:
+            Answer text chunks; the fixed no-context answer if there are no chunks
+        """
+        if not context_chunks:
+            yield NO_CONTEXT_ANSWER
+            return
+        
+        context = self._format_context(sorted(context_chunks, key=_chunk_order_key))
+        async for chunk in self.llm.astream(self._rag_messages(context, question)):
+            if chunk.content:
+                yield chunk.content
+    
     def query_sync(
         self,
         question: str,
@@ -92,24 +238,15 @@ class RAGService:
         
         if not context_chunks:
             return {
-                "answer": "抱歉，我在知识库中没有找到与您问题相关的内容。请确保已上传相关的课程资料，或尝试换一种方式提问。",
+                "answer": NO_CONTEXT_ANSWER,
                 "sources": [],
                 "has_context": False
             }
         
-        # Format context and generate
-        context = self._format_context(context_chunks)
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", RAG_SYSTEM_PROMPT),
-            ("human", "{question}")
-        ])
+        # Format context in the same canonical chunk order as the async paths
+        context = self._format_context(sorted(context_chunks, key=_chunk_order_key))
         
-        chain = prompt | self.llm | StrOutputParser()
-        answer = chain.invoke({
-            "context": context,
-            "question": question
-        })
+        answer = self.llm.invoke(self._rag_messages(context, question)).content
         
         result = {
             "answer": answer,
@@ -117,53 +254,54 @@ class RAGService:
         }
         
         if include_sources:
-            result["sources"] = self._format_sources(context_chunks)
+            result["sources"] = self.format_sources(context_chunks)
         
         return result
     
+    @staticmethod
+    def _rag_messages(context: str, question: str) -> List:
+        """System prompt filled from the precompiled template, then the question"""
+        return [SystemMessage(content=render_rag(context)), HumanMessage(content=question)]
+    
     def _format_context(self, chunks: List[Dict]) -> str:
-        """Format retrieved chunks into context string"""
-        context_parts = []
-        
-        for i, chunk in enumerate(chunks, 1):
-            source = chunk["metadata"].get("source", "Unknown")
-            page = chunk["metadata"].get("page", "N/A")
-            content = chunk["content"]
-            
-            context_parts.append(
-                f"【参考资料 {i}】\n"
-                f"来源：{source}，第{page}页\n"
-                f"内容：{content}\n"
-            )
-        
-        return "\n".join(context_parts)
+        """Format retrieved chunks into context string with a single join"""
+        return "\n".join(
+            f"【参考资料 {i}】\n"
+            f"来源：{chunk['metadata'].get('source', 'Unknown')}，"
+            f"第{chunk['metadata'].get('page', 'N/A')}页\n"
+            f"内容：{chunk['content']}\n"
+            for i, chunk in enumerate(chunks, 1)
+        )
     
-    def _format_sources(self, chunks: List[Dict]) -> List[Dict]:
-        """Format source references for response"""
-        sources = []
-        seen = set()
-        
+    def format_sources(self, chunks: List[Dict]) -> List[Dict]:
+        """Format source references for response, one per (source, page)"""
+        # Dicts keep insertion order, so the first (most relevant) chunk wins
+        first_chunks: Dict[tuple, Dict] = {}
         for chunk in chunks:
-            source = chunk["metadata"].get("source", "Unknown")
-            page = chunk["metadata"].get("page", "N/A")
-            key = f"{source}_{page}"
-            
-            if key not in seen:
-                seen.add(key)
-                sources.append({
-                    "source": f"《{source}》第{page}页",
-                    "content": chunk["content"][:150] + "...",
-                    "relevance_score": chunk.get("relevance_score", 0)
-                })
+            metadata = chunk["metadata"]
+            first_chunks.setdefault(
+                (metadata.get("source", "Unknown"), metadata.get("page", "N/A")), chunk
+            )
         
-        return sources
+        return [
+            {
+                "source": f"《{source}》第{page}页",
+                # Chunks ingested before previews were stored are sliced here
+                "content": chunk["metadata"].get("preview") or chunk["content"][:150] + "...",
+                "relevance_score": chunk.get("relevance_score", 0)
+            }
+            for (source, page), chunk in first_chunks.items()
+        ]
     
     def get_relevant_context(self, question: str, k: int = 5) -> List[Dict]:
         """
         Get relevant context without generating answer.
         
+        Uses hybrid BM25 + vector retrieval unless disabled in settings.
         Useful for debugging or showing retrieved chunks.
         """
+        if settings.hybrid_search:
+            return self.vector_store.hybrid_search(question, k=k)
         return self.vector_store.search(question, k=k)
 
 
@@ -192,14 +330,12 @@ class KnowledgeService:
         Returns:
             Summary of the operation
         """
-        # Add source filename to each chunk's metadata
-        for chunk in chunks:
-            if "metadata" not in chunk:
-                chunk["metadata"] = {}
-            chunk["metadata"]["source"] = filename
-        
-        # Add to vector store
-        count = self.vector_store.add_documents(chunks, document_id)
+        # All chunks are embedded in batched encoder calls and written with
+        # one collection insert; the filename is merged into every chunk's metadata
+        count = self.vector_store.add_documents(
+            chunks, document_id, metadata={"source": filename}
+        )
+        RAGService.clear_retrieval_cache()
         
         return {
             "document_id": document_id,
@@ -211,6 +347,8 @@ class KnowledgeService:
     def delete_document(self, document_id: str) -> Dict:
         """Delete a document from the knowledge base"""
         count = self.vector_store.delete_document(document_id)
+        if count:
+            RAGService.clear_retrieval_cache()
         
         return {
             "document_id": document_id,
@@ -227,11 +365,13 @@ class KnowledgeService:
         return self.vector_store.list_documents()
 
 
+@lru_cache(maxsize=1)
 def get_rag_service() -> RAGService:
-    """Get RAG service instance"""
+    """Get the shared RAG service instance"""
     return RAGService()
 
 
+@lru_cache(maxsize=1)
 def get_knowledge_service() -> KnowledgeService:
-    """Get knowledge service instance"""
+    """Get the shared knowledge service instance"""
     return KnowledgeService()
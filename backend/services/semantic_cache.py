@@ -0,0 +1,114 @@
+"""
+Semantic cache for RAG answers keyed by query embedding
+"""
+import time
+import threading
+from typing import List, Dict, Optional
+import numpy as np
+
+from backend.core.embedding_cache import embed_with_cache
+
+
+class SemanticCache:
+    """
+    Approximate cache for RAG results.
+
+    A lookup hits when the cosine distance between the query embedding
+    and a live cached key is within `tau`, so rephrased questions reuse the
+    previous answer without another vector search or LLM call. Entries
+    sit in a ring buffer: when full, the oldest slot is overwritten.
+
+    Each entry records the knowledge base generation it was computed
+    under, and lookups only match entries of the caller's generation, so
+    answers from before any worker's upload or delete are never served.
+    """
+
+    def __init__(self, capacity: int = 1024, tau: float = 0.08, ttl: Optional[float] = 600):
+        """
+        Initialize the cache.
+
+        Args:
+            capacity: Maximum number of cached entries
+            tau: Maximum cosine distance (1 - similarity) for a hit
+            ttl: Seconds an entry stays valid (None = never expires)
+        """
+        self.capacity = capacity
+        self.tau = tau
+        self.ttl = ttl
+        self._keys: Optional[np.ndarray] = None  # [capacity, dim], L2-normalized
+        self._expires_at = np.full(capacity, np.inf)
+        self._generations = np.zeros(capacity, dtype=np.int64)
+        self._results: List[Optional[Dict]] = [None] * capacity
+        self._size = 0
+        self._next = 0  # Slot the next insert writes
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed text as a normalized float32 vector, reusing cached embeddings"""
+        return embed_with_cache(text)
+
+    def lookup(self, embedding: np.ndarray, generation: int = 0) -> Optional[Dict]:
+        """
+        Find a cached result close to the given embedding.
+
+        Args:
+            embedding: Normalized query embedding
+            generation: Current knowledge base generation
+
+        Returns:
+            Cached result dict, or None on a miss
+        """
+        with self._lock:
+            if self._size == 0:
+                return None
+
+            sims = self._keys[:self._size] @ embedding
+            stale = self._expires_at[:self._size] <= time.monotonic()
+            stale |= self._generations[:self._size] != generation
+            sims[stale] = -np.inf
+            idx = int(sims.argmax())
+            if 1 - sims[idx] <= self.tau:
+                return self._results[idx]
+            return None
+
+    def insert(self, embedding: np.ndarray, result: Dict, generation: int = 0) -> None:
+        """
+        Insert a result, overwriting the oldest entry when full (FIFO).
+
+        Args:
+            embedding: Normalized query embedding
+            result: Dict with 'answer', 'sources' and 'has_context'
+            generation: Knowledge base generation read before retrieval
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else np.inf
+        with self._lock:
+            if self._keys is None:
+                self._keys = np.zeros((self.capacity, embedding.shape[0]), dtype=np.float32)
+
+            slot = self._next
+            self._keys[slot] = embedding
+            self._results[slot] = result
+            self._expires_at[slot] = expires_at
+            self._generations[slot] = generation
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        with self._lock:
+            self._keys = None
+            self._expires_at[:] = np.inf
+            self._results = [None] * self.capacity
+            self._size = 0
+            self._next = 0
+
+
+_semantic_cache: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Get the shared semantic cache instance"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache()
+    return _semantic_cache
@@ -1,49 +1,124 @@
 """
 User service for authentication and profile management
 """
+import os
+import re
+import hmac
+import base64
+import asyncio
 import hashlib
-import secrets
+import threading
 from datetime import datetime, timedelta
 from typing import Optional, Dict
-from sqlalchemy.orm import Session
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from sqlalchemy import select, union_all, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.models.user import User
 from backend.models.profile import LearningProfile
 
+# Names of the unique indexes created by `unique=True, index=True` on User
+_USERNAME_INDEX = "ix_users_username"
+_EMAIL_INDEX = "ix_users_email"
+
+# MySQL ER_DUP_ENTRY: "Duplicate entry '<value>' for key '[<table>.]<index>'";
+# anchored at the end so the quoted value can't be mistaken for the key
+_ER_DUP_ENTRY = 1062
+_DUP_KEY_RE = re.compile(r"for key '(?:[^'.]*\.)?([^'.]*)'$")
+
+# Login by username or email as two unique-index point lookups; an OR
+# across both columns can fall back to a full scan
+_login = bindparam("login")
+_USER_BY_LOGIN = select(User).from_statement(
+    union_all(
+        select(User).where(User.username == _login),
+        select(User).where(User.email == _login)
+    ).limit(1)
+)
+
+# Session tokens are sliced from a pre-drawn entropy buffer: one
+# os.urandom call per ENTROPY_REFILL_BYTES // TOKEN_BYTES tokens
+TOKEN_BYTES = 32
+ENTROPY_REFILL_BYTES = 4096
+_entropy_buf = bytearray()
+_entropy_lock = threading.Lock()
+
+# A forked worker must never hand out the parent's remaining bytes
+if hasattr(os, "register_at_fork"):  # Not available on Windows, which doesn't fork
+    os.register_at_fork(after_in_child=_entropy_buf.clear)
+
+# Argon2id with argon2-cffi's default (RFC 9106 low-memory) cost parameters
+_password_hasher = PasswordHasher()
+
+
+def _duplicate_key_name(error: IntegrityError) -> Optional[str]:
+    """Unique index named by a MySQL duplicate-entry error, or None for other errors"""
+    args = getattr(error.orig, "args", ())
+    if len(args) < 2 or args[0] != _ER_DUP_ENTRY:
+        return None
+    match = _DUP_KEY_RE.search(str(args[1]))
+    return match.group(1) if match else None
+
 
 class AuthService:
     """Authentication service"""
     
     @staticmethod
     def hash_password(password: str) -> str:
-        """Hash password using SHA-256 with salt"""
-        salt = secrets.token_hex(16)
-        hashed = hashlib.sha256((password + salt).encode()).hexdigest()
-        return f"{salt}:{hashed}"
+        """Hash password with Argon2id"""
+        return _password_hasher.hash(password)
     
     @staticmethod
     def verify_password(password: str, hashed_password: str) -> bool:
-        """Verify password against hash"""
+        """
+        Verify password against hash.
+        
+        Accepts Argon2 hashes and legacy "salt:sha256" hashes.
+        """
+        if not hashed_password.startswith("$argon2"):
+            return AuthService._verify_legacy_password(password, hashed_password)
+        try:
+            return _password_hasher.verify(hashed_password, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    
+    @staticmethod
+    def needs_rehash(hashed_password: str) -> bool:
+        """Whether a stored hash is legacy or uses outdated Argon2 parameters"""
+        if not hashed_password.startswith("$argon2"):
+            return True
+        return _password_hasher.check_needs_rehash(hashed_password)
+    
+    @staticmethod
+    def _verify_legacy_password(password: str, hashed_password: str) -> bool:
+        """Verify a pre-Argon2 salted SHA-256 hash in constant time"""
         try:
             salt, stored_hash = hashed_password.split(":")
-            computed_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-            return computed_hash == stored_hash
         except ValueError:
             return False
+        computed_hash = hashlib.sha256((password + salt).encode()).hexdigest()
+        return hmac.compare_digest(computed_hash, stored_hash)
     
     @staticmethod
     def generate_token() -> str:
-        """Generate a simple session token"""
-        return secrets.token_urlsafe(32)
+        """Generate a simple session token (32 random bytes, URL-safe base64)"""
+        with _entropy_lock:
+            if len(_entropy_buf) < TOKEN_BYTES:
+                _entropy_buf.extend(os.urandom(ENTROPY_REFILL_BYTES))
+            raw = bytes(_entropy_buf[:TOKEN_BYTES])
+            del _entropy_buf[:TOKEN_BYTES]
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
 
 
 class UserService:
     """User management service"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def create_user(
+    async def create_user(
         self,
         username: str,
         email: str,
@@ -56,31 +131,33 @@ class UserService:
         Returns:
             Dict with user info or error
         """
-        # Check if username exists
-        if self.db.query(User).filter(User.username == username).first():
-            return {"success": False, "error": "用户名已存在"}
-        
-        # Check if email exists
-        if self.db.query(User).filter(User.email == email).first():
-            return {"success": False, "error": "邮箱已被注册"}
-        
-        # Create user
+        # Create user; hashing is CPU-bound, so keep it off the event loop
         user = User(
             username=username,
             email=email,
-            hashed_password=AuthService.hash_password(password),
+            hashed_password=await asyncio.to_thread(AuthService.hash_password, password),
             display_name=display_name or username
         )
         
+        # The unique indexes on username and email reject duplicates, so no
+        # lookups are needed beforehand
         self.db.add(user)
-        self.db.flush()  # Get user ID
+        try:
+            await self.db.flush()  # Get user ID
+        except IntegrityError as e:
+            await self.db.rollback()
+            key = _duplicate_key_name(e)
+            if key == _USERNAME_INDEX:
+                return {"success": False, "error": "用户名已存在"}
+            if key == _EMAIL_INDEX:
+                return {"success": False, "error": "邮箱已被注册"}
+            raise
         
         # Create learning profile
         profile = LearningProfile(user_id=user.id)
         self.db.add(profile)
         
-        self.db.commit()
-        self.db.refresh(user)
+        await self.db.commit()
         
         return {
             "success": True,
@@ -92,7 +169,7 @@ class UserService:
             }
         }
     
-    def authenticate(self, username: str, password: str) -> Dict:
+    async def authenticate(self, username: str, password: str) -> Dict:
         """
         Authenticate user credentials.
         
@@ -100,9 +177,8 @@ class UserService:
             Dict with token or error
         """
         # Find user by username or email
-        user = self.db.query(User).filter(
-            (User.username == username) | (User.email == username)
-        ).first()
+        result = await self.db.execute(_USER_BY_LOGIN, {"login": username})
+        user = result.scalars().first()
         
         if not user:
             return {"success": False, "error": "用户不存在"}
@@ -110,12 +186,18 @@ class UserService:
         if not user.is_active:
             return {"success": False, "error": "账户已被禁用"}
         
-        if not AuthService.verify_password(password, user.hashed_password):
+        if not await asyncio.to_thread(
+            AuthService.verify_password, password, user.hashed_password
+        ):
             return {"success": False, "error": "密码错误"}
         
+        # Upgrade legacy or outdated hashes while the plaintext is at hand
+        if AuthService.needs_rehash(user.hashed_password):
+            user.hashed_password = await asyncio.to_thread(AuthService.hash_password, password)
+        
         # Update last login
         user.last_login_at = datetime.utcnow()
-        self.db.commit()
+        await self.db.commit()
         
         # Generate token
         token = AuthService.generate_token()
@@ -131,17 +213,19 @@ class UserService:
             }
         }
     
-    def get_user_by_id(self, user_id: int) -> Optional[User]:
+    async def get_user_by_id(self, user_id: int) -> Optional[User]:
         """Get user by ID"""
-        return self.db.query(User).filter(User.id == user_id).first()
+        result = await self.db.execute(select(User).where(User.id == user_id))
+        return result.scalars().first()
     
-    def get_user_by_username(self, username: str) -> Optional[User]:
+    async def get_user_by_username(self, username: str) -> Optional[User]:
         """Get user by username"""
-        return self.db.query(User).filter(User.username == username).first()
+        result = await self.db.execute(select(User).where(User.username == username))
+        return result.scalars().first()
     
-    def update_user(self, user_id: int, **kwargs) -> Dict:
+    async def update_user(self, user_id: int, **kwargs) -> Dict:
         """Update user profile"""
-        user = self.get_user_by_id(user_id)
+        user = await self.get_user_by_id(user_id)
         if not user:
             return {"success": False, "error": "用户不存在"}
         
@@ -151,7 +235,7 @@ class UserService:
             if field in allowed_fields and value is not None:
                 setattr(user, field, value)
         
-        self.db.commit()
+        await self.db.commit()
         
         return {
             "success": True,
@@ -163,16 +247,18 @@ class UserService:
             }
         }
     
-    def change_password(self, user_id: int, old_password: str, new_password: str) -> Dict:
+    async def change_password(self, user_id: int, old_password: str, new_password: str) -> Dict:
         """Change user password"""
-        user = self.get_user_by_id(user_id)
+        user = await self.get_user_by_id(user_id)
         if not user:
             return {"success": False, "error": "用户不存在"}
         
-        if not AuthService.verify_password(old_password, user.hashed_password):
+        if not await asyncio.to_thread(
+            AuthService.verify_password, old_password, user.hashed_password
+        ):
             return {"success": False, "error": "原密码错误"}
         
-        user.hashed_password = AuthService.hash_password(new_password)
-        self.db.commit()
+        user.hashed_password = await asyncio.to_thread(AuthService.hash_password, new_password)
+        await self.db.commit()
         
         return {"success": True, "message": "密码修改成功"}
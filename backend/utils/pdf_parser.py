@@ -2,21 +2,82 @@
 PDF document parser using PyMuPDF
 """
 import fitz  # PyMuPDF
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import re
 
+# Compiled once at import instead of looked up per page
+_WHITESPACE_RE = re.compile(r'[ \t]+')
+
+# Blocks lying wholly within this fraction of the page height from the top
+# or bottom edge, and no longer than HEADER_MAX_CHARS, are treated as
+# headers/footers
+HEADER_MARGIN = 0.07
+HEADER_MAX_CHARS = 80
+
+# Documents with fewer pages are not worth fanning out to workers
+PARALLEL_MIN_PAGES = 32
+
+
+def _is_header_footer(block: tuple, top: float, bottom: float) -> bool:
+    """
+    Whether a text block is a running header, footer or page number.
+    
+    Only short blocks entirely inside a margin band qualify; body text that
+    merely starts or ends in a band is kept.
+    
+    Args:
+        block: PyMuPDF block (x0, y0, x1, y1, text, block_no, block_type)
+        top: Lower edge of the top band
+        bottom: Upper edge of the bottom band
+    """
+    in_band = block[3] <= top or block[1] >= bottom
+    return in_band and len(block[4].strip()) <= HEADER_MAX_CHARS
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """
+    Extract and clean pages [start, stop) of a PDF.
+    
+    Module-level so it can be pickled to worker processes.
+    
+    Returns:
+        (page_number, text) for each non-empty page, in order
+    """
+    results = []
+    with fitz.open(file_path) as doc:
+        for page_num in range(start, stop):
+            text = PDFParser._page_text(doc[page_num])
+            if text.strip():  # Only keep non-empty pages
+                results.append((page_num + 1, text))
+    return results
+
 
 class PDFParser:
     """Parse PDF documents and extract text content"""
     
     @staticmethod
-    def extract_text_from_pdf(file_path: str) -> Dict:
+    def extract_text_from_pdf(
+        file_path: str,
+        filename: Optional[str] = None,
+        executor: Optional[Executor] = None,
+        workers: int = 1
+    ) -> Dict:
         """
         Extract text content from a PDF file.
         
+        Pages are read from disk on demand, so the whole file is never
+        loaded into memory at once. With an `executor`, page ranges of
+        long documents are extracted in parallel; each worker opens its
+        own document, since PyMuPDF objects must not be shared. Use a
+        process pool: MuPDF is not thread-safe and holds the GIL.
+        
         Args:
             file_path: Path to the PDF file
+            filename: Name to report (defaults to the file's own name)
+            executor: Optional pool to spread page ranges over
+            workers: Number of page ranges to split the document into
             
         Returns:
             Dict containing:
@@ -25,32 +86,37 @@ class PDFParser:
                 - pages: List of page contents with metadata
                 - full_text: Complete text content
         """
-        doc = fitz.open(file_path)
-        filename = Path(file_path).name
+        filename = filename or Path(file_path).name
+        with fitz.open(file_path) as doc:
+            total_pages = len(doc)
+        
+        if executor is None or workers < 2 or total_pages < PARALLEL_MIN_PAGES:
+            page_texts = _extract_page_range(file_path, 0, total_pages)
+        else:
+            step = -(-total_pages // workers)  # Ceiling division
+            starts = range(0, total_pages, step)
+            page_texts = []
+            for part in executor.map(
+                _extract_page_range,
+                [file_path] * len(starts),
+                starts,
+                [min(start + step, total_pages) for start in starts]
+            ):
+                page_texts.extend(part)
         
         pages = []
         full_text_parts = []
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text("text")
-            
-            # Clean up the text
-            text = PDFParser._clean_text(text)
-            
-            if text.strip():  # Only add non-empty pages
-                pages.append({
-                    "page_number": page_num + 1,
-                    "content": text,
-                    "char_count": len(text)
-                })
-                full_text_parts.append(f"[第{page_num + 1}页]\n{text}")
-        
-        doc.close()
+        for page_number, text in page_texts:
+            pages.append({
+                "page_number": page_number,
+                "content": text,
+                "char_count": len(text)
+            })
+            full_text_parts.append(f"[第{page_number}页]\n{text}")
         
         return {
             "filename": filename,
-            "total_pages": len(doc),
+            "total_pages": total_pages,
             "pages": pages,
             "full_text": "\n\n".join(full_text_parts)
         }
@@ -74,8 +140,7 @@ class PDFParser:
         
         for page_num in range(len(doc)):
             page = doc[page_num]
-            text = page.get_text("text")
-            text = PDFParser._clean_text(text)
+            text = PDFParser._page_text(page)
             
             if text.strip():
                 pages.append({
@@ -96,24 +161,26 @@ class PDFParser:
         }
     
     @staticmethod
-    def _clean_text(text: str) -> str:
+    def _page_text(page: "fitz.Page") -> str:
         """
-        Clean extracted text.
+        Extract a page's body text from its layout blocks.
         
-        - Remove excessive whitespace
-        - Normalize line breaks
-        - Remove page headers/footers patterns
+        - Skip image blocks and short blocks wholly inside the top/bottom
+          margin bands (running headers, footers, page numbers)
+        - Join the remaining blocks as paragraphs
+        - Collapse runs of spaces/tabs
         """
-        # Normalize whitespace
-        text = re.sub(r'[ \t]+', ' ', text)
-        
-        # Normalize line breaks (keep paragraph structure)
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        # Remove common header/footer patterns (page numbers, etc.)
-        text = re.sub(r'^\s*\d+\s*$', '', text, flags=re.MULTILINE)
+        height = page.rect.height
+        top = height * HEADER_MARGIN
+        bottom = height * (1 - HEADER_MARGIN)
         
-        return text.strip()
+        # Each block is (x0, y0, x1, y1, text, block_no, block_type)
+        text = "\n\n".join(
+            block[4].strip()
+            for block in page.get_text("blocks")
+            if block[6] == 0 and block[4].strip() and not _is_header_footer(block, top, bottom)
+        )
+        return _WHITESPACE_RE.sub(' ', text)
     
     @staticmethod
     def get_pdf_metadata(file_path: str) -> Dict:
@@ -1,9 +1,17 @@
 """
 Text splitter for chunking documents
 """
-from typing import List, Dict, Optional
+from bisect import bisect_right
+from itertools import chain
+from typing import List, Dict, Optional, Tuple
 import re
 
+# Code block patterns without nested quantifiers, so matching stays linear:
+# fenced blocks (a backtick only continues the body if not followed by
+# two more) and runs of lines indented by four spaces or a tab
+_FENCED_CODE_RE = re.compile(r'```(?:[^`]|`(?!``))*```')
+_INDENTED_CODE_RE = re.compile(r'(?m)(?:^(?:    |\t).*\n?)+')
+
 
 class TextSplitter:
     """
@@ -40,6 +48,12 @@ class TextSplitter:
             " ",         # Space
             ""           # Character level (last resort)
         ]
+        
+        # One alternation finds every separator in a single C-level scan;
+        # earlier separators win when several match at the same position
+        literal = [sep for sep in self.separators if sep]
+        self._sep_re = re.compile("|".join(map(re.escape, literal))) if literal else None
+        self._sep_rank = {sep: rank for rank, sep in enumerate(literal)}
     
     def split_text(self, text: str, metadata: Optional[Dict] = None) -> List[Dict]:
         """
@@ -52,7 +66,7 @@ class TextSplitter:
         Returns:
             List of chunk dicts with content and metadata
         """
-        chunks = self._recursive_split(text, self.separators)
+        chunks = self._split(text)
         
         # Add metadata to each chunk
         result = []
@@ -87,7 +101,7 @@ class TextSplitter:
             content = page["content"]
             
             # Split page content
-            page_chunks = self._recursive_split(content, self.separators)
+            page_chunks = self._split(content)
             
             for i, chunk_content in enumerate(page_chunks):
                 chunks.append({
@@ -101,13 +115,19 @@ class TextSplitter:
         
         return chunks
     
-    def _recursive_split(self, text: str, separators: List[str]) -> List[str]:
+    def _split(self, text: str) -> List[str]:
         """
-        Recursively split text using separators.
+        Split text greedily into chunks of at most `chunk_size` characters.
+        
+        Each chunk ends at the highest-priority separator inside its window
+        (the latest one if it occurs several times) that leaves the chunk at
+        least half of `chunk_size` long; a separator right after the previous
+        cut would otherwise produce a sliver. Without such a separator the
+        highest-priority one at any length is used, then a hard cut at
+        `chunk_size`. Consecutive chunks overlap by `chunk_overlap`.
         
         Args:
             text: Text to split
-            separators: Remaining separators to try
             
         Returns:
             List of text chunks
@@ -115,73 +135,54 @@ class TextSplitter:
         if not text:
             return []
         
+        # Settings are fixed after __init__; bind them once as locals
+        chunk_size = self.chunk_size
+        chunk_overlap = self.chunk_overlap
+        min_chunk = chunk_size // 2
+        
         # If text is already small enough, return it
-        if len(text) <= self.chunk_size:
+        if len(text) <= chunk_size:
             return [text] if text.strip() else []
         
-        # Try each separator
-        for i, separator in enumerate(separators):
-            if separator == "":
-                # Character-level split (last resort)
-                return self._split_by_size(text)
-            
-            if separator in text:
-                splits = text.split(separator)
-                
-                # Recursively process each split
-                chunks = []
-                current_chunk = ""
-                
-                for split in splits:
-                    # Add separator back (except for the last one)
-                    piece = split + separator if separator else split
-                    
-                    if len(current_chunk) + len(piece) <= self.chunk_size:
-                        current_chunk += piece
-                    else:
-                        if current_chunk.strip():
-                            # Current chunk is full, save it
-                            chunks.append(current_chunk.strip())
-                        
-                        # Start new chunk (with overlap if possible)
-                        if self.chunk_overlap > 0 and current_chunk:
-                            overlap = current_chunk[-self.chunk_overlap:]
-                            current_chunk = overlap + piece
-                        else:
-                            current_chunk = piece
-                        
-                        # If piece itself is too large, split it further
-                        if len(current_chunk) > self.chunk_size:
-                            sub_chunks = self._recursive_split(
-                                current_chunk, 
-                                separators[i+1:]
-                            )
-                            if sub_chunks:
-                                chunks.extend(sub_chunks[:-1])
-                                current_chunk = sub_chunks[-1] if sub_chunks else ""
-                
-                # Don't forget the last chunk
-                if current_chunk.strip():
-                    chunks.append(current_chunk.strip())
-                
-                return chunks
-        
-        # No separator found, split by size
-        return self._split_by_size(text)
-    
-    def _split_by_size(self, text: str) -> List[str]:
-        """Split text by fixed size with overlap."""
+        # Break offsets (just after each separator), grouped by priority
+        breaks: List[List[int]] = [[] for _ in self._sep_rank]
+        if self._sep_re is not None:
+            sep_rank = self._sep_rank
+            add_break = [offsets.append for offsets in breaks]
+            for match in self._sep_re.finditer(text):
+                add_break[sep_rank[match.group()]](match.end())
+        
         chunks = []
         start = 0
+        prev_cut = 0
+        length = len(text)
         
-        while start < len(text):
-            end = start + self.chunk_size
-            chunk = text[start:end]
+        while start < length:
+            limit = start + chunk_size
+            if limit >= length:
+                cut = length
+            else:
+                cut = fallback = 0
+                min_cut = start + min_chunk
+                for offsets in breaks:
+                    # Latest break of this priority in (prev_cut, limit]
+                    idx = bisect_right(offsets, limit) - 1
+                    if idx >= 0 and offsets[idx] > prev_cut:
+                        if offsets[idx] >= min_cut:
+                            cut = offsets[idx]
+                            break
+                        fallback = fallback or offsets[idx]
+                # Short chunk at a separator, else a character-level cut (last resort)
+                cut = cut or fallback or limit
             
-            if chunk.strip():
-                chunks.append(chunk.strip())
+            chunk = text[start:cut].strip()
+            if chunk:
+                chunks.append(chunk)
+            if cut >= length:
+                break
             
-            start = end - self.chunk_overlap
+            prev_cut = cut
+            start = max(cut - chunk_overlap, start + 1)
         
         return chunks
 
@@ -195,32 +196,44 @@ class CodeAwareTextSplitter(TextSplitter):
     
     def __init__(self, chunk_size: int = 800, chunk_overlap: int = 100):
         super().__init__(chunk_size, chunk_overlap)
-        # Pattern to match code blocks
-        self.code_pattern = re.compile(
-            r'```[\s\S]*?```|'  # Markdown code blocks
-            r'(?:^|\n)(?:    |\t).*(?:\n(?:    |\t).*)*',  # Indented code
-            re.MULTILINE
+    
+    @staticmethod
+    def _code_spans(text: str) -> List[Tuple[int, int]]:
+        """
+        Find fenced and indented code blocks as non-overlapping (start, end) spans.
+        
+        Indented lines inside a fenced block belong to the fenced block.
+        """
+        matches = sorted(
+            chain(_FENCED_CODE_RE.finditer(text), _INDENTED_CODE_RE.finditer(text)),
+            key=lambda m: m.start()
         )
+        spans = []
+        for match in matches:
+            if spans and match.start() < spans[-1][1]:
+                continue
+            spans.append(match.span())
+        return spans
     
     def split_text(self, text: str, metadata: Optional[Dict] = None) -> List[Dict]:
         """Split text while preserving code blocks."""
         # Find all code blocks
-        code_blocks = list(self.code_pattern.finditer(text))
+        code_spans = self._code_spans(text)
         
-        if not code_blocks:
+        if not code_spans:
             return super().split_text(text, metadata)
         
         chunks = []
         last_end = 0
         
-        for match in code_blocks:
+        for start, end in code_spans:
             # Split text before code block
-            before_text = text[last_end:match.start()]
+            before_text = text[last_end:start]
             if before_text.strip():
                 chunks.extend(super().split_text(before_text, metadata))
             
             # Keep code block as a single chunk (if not too large)
-            code_block = match.group()
+            code_block = text[start:end]
             if len(code_block) <= self.chunk_size * 2:  # Allow larger chunks for code
                 chunk_data = {
                     "content": code_block,
@@ -235,7 +248,7 @@ class CodeAwareTextSplitter(TextSplitter):
                 # Code block too large, split it
                 chunks.extend(super().split_text(code_block, metadata))
             
-            last_end = match.end()
+            last_end = end
         
         # Handle remaining text after last code block
         remaining = text[last_end:]
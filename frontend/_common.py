@@ -0,0 +1,242 @@
+"""
+Shared Streamlit helpers: API client, session state, auth widgets, styling
+"""
+import json
+import logging
+import threading
+from collections import defaultdict, deque
+from pathlib import Path
+from time import perf_counter
+import streamlit as st
+import httpx
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+API_BASE_URL = "http://localhost:8000/api"
+# Speak HTTP/2 without an HTTP/1.1 fallback (h2c prior knowledge). Plain
+# http:// only multiplexes this way; uvicorn has no HTTP/2, so enable it
+# only when the backend runs under Hypercorn
+API_HTTP2_ONLY = False
+
+# Liveness probe: empty-bodied HEAD with a short budget so a slow backend can't stall the sidebar
+PING_URL = "http://localhost:8000/ping"
+HEALTH_TIMEOUT = 0.5
+
+# Recent request latencies kept per endpoint for the debug panel
+METRICS_WINDOW = 200
+
+_latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=METRICS_WINDOW))
+_latencies_lock = threading.Lock()
+
+# Custom CSS
+STYLE_PATH = Path(__file__).parent / "assets" / "style.css"
+
+
+def init_session_state():
+    """Initialize session state variables"""
+    if "messages" not in st.session_state:
+        st.session_state.messages = []
+    if "conversation_id" not in st.session_state:
+        st.session_state.conversation_id = None
+    if "user" not in st.session_state:
+        st.session_state.user = None
+    if "token" not in st.session_state:
+        st.session_state.token = None
+    if "stream_responses" not in st.session_state:
+        st.session_state.stream_responses = True
+    if "debug" not in st.session_state:
+        st.session_state.debug = False
+
+
+@st.cache_resource
+def load_css() -> str:
+    """Custom stylesheet as a <style> block, read from disk once per server"""
+    return f"<style>\n{STYLE_PATH.read_text(encoding='utf-8')}</style>"
+
+
+def record_latency(endpoint: str, seconds: float):
+    """Record how long a backend request took"""
+    with _latencies_lock:
+        _latencies[endpoint].append(seconds)
+
+
+def latency_percentiles() -> Dict[str, Tuple[int, float, float]]:
+    """Per-endpoint (sample count, p50 seconds, p95 seconds) over the recent window"""
+    with _latencies_lock:
+        samples = {endpoint: sorted(values) for endpoint, values in _latencies.items() if values}
+    return {
+        endpoint: (
+            len(values),
+            values[len(values) // 2],
+            values[min(len(values) - 1, int(len(values) * 0.95))]
+        )
+        for endpoint, values in samples.items()
+    }
+
+
+def render_latency_metrics():
+    """Show request latency percentiles (debug mode)"""
+    metrics = latency_percentiles()
+    if not metrics:
+        st.caption("暂无请求记录")
+        return
+    st.markdown("\n".join(
+        f"- `{endpoint}` ×{count}: p50 {p50 * 1000:.0f} ms / p95 {p95 * 1000:.0f} ms"
+        for endpoint, (count, p50, p95) in sorted(metrics.items())
+    ))
+
+
+@st.cache_resource
+def _get_client() -> httpx.Client:
+    """Shared HTTP client, kept alive across reruns so connections are reused"""
+    return httpx.Client(
+        base_url=API_BASE_URL,
+        http2=True,
+        http1=not API_HTTP2_ONLY,
+        timeout=httpx.Timeout(60.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+
+
+def call_api(endpoint: str, method: str = "GET", data: dict = None, **kwargs) -> Optional[dict]:
+    """
+    Call backend API.
+    
+    Extra keyword arguments (files, params, timeout) are passed to httpx.
+    Errors are shown with st.error and return None.
+    """
+    start = perf_counter()
+    try:
+        client = _get_client()
+        response = client.request(
+            method, endpoint, json=data if method != "GET" else None, **kwargs
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logger.warning("call_api %s: %s", endpoint, e)
+        try:
+            error_detail = e.response.json().get("detail", str(e))
+        except ValueError:
+            error_detail = str(e)
+        st.error(f"API 错误: {error_detail}")
+        return None
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning("call_api %s: %s", endpoint, e)
+        st.error(f"网络错误: {e}")
+        return None
+    finally:
+        record_latency(endpoint, perf_counter() - start)
+
+
+@st.cache_data(ttl=15, show_spinner=False)
+def backend_health() -> Dict:
+    """HEAD the backend liveness endpoint; cached so reruns don't re-probe"""
+    start = perf_counter()
+    try:
+        response = _get_client().head(PING_URL, timeout=HEALTH_TIMEOUT)
+        return {"reachable": True, "healthy": response.status_code == 200}
+    except httpx.HTTPError as e:
+        logger.warning("health probe: %s", e)
+        return {"reachable": False, "healthy": False}
+    finally:
+        record_latency("ping", perf_counter() - start)
+
+
+def stream_chat(data: dict, result: Dict) -> Iterator[str]:
+    """
+    Call the streaming chat API, yielding answer chunks as they arrive.
+    
+    The final event (conversation_id, sources) is stored in `result`;
+    on failure `result["error"]` holds the message instead.
+    """
+    start = perf_counter()
+    try:
+        with _get_client().stream("POST", "chat/stream", json=data) as response:
+            if response.is_error:
+                response.read()
+                try:
+                    result["error"] = f"API 错误: {response.json().get('detail', response.text)}"
+                except ValueError:
+                    result["error"] = f"API 错误: {response.text}"
+                return
+            
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                if event["type"] == "delta":
+                    yield event["content"]
+                elif event["type"] == "done":
+                    result.update(event)
+                elif event["type"] == "error":
+                    result["error"] = f"API 错误: {event['detail']}"
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning("stream_chat: %s", e)
+        result["error"] = f"网络错误: {e}"
+    finally:
+        record_latency("chat/stream", perf_counter() - start)
+
+
+def login_form():
+    """Display login form (call inside the sidebar)"""
+    with st.expander("🔐 登录 / 注册", expanded=not st.session_state.user):
+        tab1, tab2 = st.tabs(["登录", "注册"])
+        
+        with tab1:
+            with st.form("login_form"):
+                username = st.text_input("用户名/邮箱")
+                password = st.text_input("密码", type="password")
+                submitted = st.form_submit_button("登录")
+                
+                if submitted:
+                    if username and password:
+                        result = call_api("user/login", "POST", {
+                            "username": username,
+                            "password": password
+                        })
+                        if result and result.get("success"):
+                            st.session_state.user = result["user"]
+                            st.session_state.token = result["token"]
+                            st.success(f"欢迎回来，{result['user']['display_name']}！")
+                            st.rerun()
+                        elif result:
+                            st.error(result.get("error", "登录失败"))
+                    else:
+                        st.warning("请输入用户名和密码")
+        
+        with tab2:
+            with st.form("register_form"):
+                new_username = st.text_input("用户名", key="reg_username")
+                new_email = st.text_input("邮箱", key="reg_email")
+                new_password = st.text_input("密码", type="password", key="reg_password")
+                display_name = st.text_input("昵称（可选）", key="reg_display")
+                submitted = st.form_submit_button("注册")
+                
+                if submitted:
+                    if new_username and new_email and new_password:
+                        result = call_api("user/register", "POST", {
+                            "username": new_username,
+                            "email": new_email,
+                            "password": new_password,
+                            "display_name": display_name or new_username
+                        })
+                        if result and result.get("success"):
+                            st.session_state.user = result["user"]
+                            st.session_state.token = result["token"]
+                            st.success("注册成功！")
+                            st.rerun()
+                        elif result:
+                            st.error(result.get("error", "注册失败"))
+                    else:
+                        st.warning("请填写所有必填项")
+
+
+def logout():
+    """Logout current user"""
+    st.session_state.user = None
+    st.session_state.token = None
+    st.session_state.messages = []
+    st.session_state.conversation_id = None
@@ -0,0 +1,84 @@
+"""
+Async API helpers running on a shared background event loop
+"""
+import asyncio
+import logging
+import threading
+from time import perf_counter
+import streamlit as st
+import httpx
+from typing import Any, Dict, Optional
+
+from _common import API_BASE_URL, API_HTTP2_ONLY, record_latency
+
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Background event loop shared by all sessions.
+
+    The AsyncClient's connections belong to the loop they were opened on,
+    so requests are always run here rather than in a fresh asyncio.run().
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+@st.cache_resource
+def _get_async_client() -> httpx.AsyncClient:
+    """Shared async HTTP client, kept alive across reruns"""
+    return httpx.AsyncClient(
+        base_url=API_BASE_URL,
+        http2=True,
+        http1=not API_HTTP2_ONLY,
+        timeout=httpx.Timeout(10.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+
+
+def run(coro) -> Any:
+    """Run a coroutine on the shared loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop()).result()
+
+
+async def aget(path: str, **kwargs) -> Optional[Any]:
+    """GET a backend resource, returning the decoded JSON or None on failure"""
+    start = perf_counter()
+    try:
+        response = await _get_async_client().get(path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning("get %s: %s", path, e)
+        return None
+    finally:
+        record_latency(path, perf_counter() - start)
+
+
+async def apost(path: str, json: dict = None, **kwargs) -> Optional[Any]:
+    """POST to a backend resource, returning the decoded JSON or None on failure"""
+    start = perf_counter()
+    try:
+        response = await _get_async_client().post(path, json=json, **kwargs)
+        response.raise_for_status()
+        return response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning("post %s: %s", path, e)
+        return None
+    finally:
+        record_latency(path, perf_counter() - start)
+
+
+def fetch_overview() -> Dict:
+    """
+    Fetch backend health, knowledge base stats and the document list in one
+    /api/dashboard round-trip.
+
+    Returns:
+        Dict with 'health', 'stats' and 'documents'; each is None if the request failed
+    """
+    dashboard = run(aget("dashboard")) or {}
+    return {key: dashboard.get(key) for key in ("health", "stats", "documents")}
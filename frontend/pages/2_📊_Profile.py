@@ -1,10 +1,9 @@
 """
 Student Learning Profile Page
 """
+import altair as alt
+import pandas as pd
 import streamlit as st
-import httpx
-
-API_BASE_URL = "http://localhost:8000/api"
 
 st.set_page_config(page_title="学习画像 - AI Tutor", page_icon="📊", layout="wide")
 
@@ -37,12 +36,18 @@ knowledge_points = [
     {"name": "排序算法", "category": "排序", "mastery": 0},
 ]
 
-for kp in knowledge_points:
-    col1, col2 = st.columns([3, 1])
-    with col1:
-        st.progress(kp["mastery"] / 100, text=f"{kp['name']} ({kp['category']})")
-    with col2:
-        st.caption(f"{kp['mastery']}%")
+# One chart for all points instead of a progress widget per row
+df = pd.DataFrame(knowledge_points)
+overall = df["mastery"].mean() if len(df) else 0
+st.progress(overall / 100, text=f"总体掌握度 {overall:.0f}%")
+
+chart = alt.Chart(df).mark_bar().encode(
+    x=alt.X("mastery:Q", title="掌握度 (%)", scale=alt.Scale(domain=[0, 100])),
+    y=alt.Y("name:N", title=None, sort="-x"),
+    color=alt.Color("category:N", title="类别"),
+    tooltip=["name", "category", "mastery"]
+)
+st.altair_chart(chart, use_container_width=True)
 
 st.markdown("---")
 
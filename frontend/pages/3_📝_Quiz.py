@@ -2,9 +2,6 @@
 Quiz and Practice Page
 """
 import streamlit as st
-import httpx
-
-API_BASE_URL = "http://localhost:8000/api"
 
 st.set_page_config(page_title="智能练习 - AI Tutor", page_icon="📝", layout="wide")
 
@@ -14,21 +11,25 @@ st.markdown("针对你的薄弱知识点，生成个性化练习题")
 # Quiz generation settings
 st.subheader("⚙️ 练习设置")
 
-col1, col2, col3 = st.columns(3)
-with col1:
-    knowledge_point = st.selectbox(
-        "选择知识点",
-        ["自动推荐（基于薄弱点）", "线性表", "栈和队列", "二叉树", "图", "排序算法"]
-    )
-with col2:
-    difficulty = st.selectbox(
-        "难度等级",
-        ["自适应", "简单", "中等", "困难"]
-    )
-with col3:
-    question_count = st.number_input("题目数量", min_value=1, max_value=20, value=5)
+# Settings are submitted together, so adjusting them doesn't rerun the page
+with st.form("quiz_settings"):
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        knowledge_point = st.selectbox(
+            "选择知识点",
+            ["自动推荐（基于薄弱点）", "线性表", "栈和队列", "二叉树", "图", "排序算法"]
+        )
+    with col2:
+        difficulty = st.selectbox(
+            "难度等级",
+            ["自适应", "简单", "中等", "困难"]
+        )
+    with col3:
+        question_count = st.number_input("题目数量", min_value=1, max_value=20, value=5)
+    
+    submitted = st.form_submit_button("🎲 生成练习题", type="primary")
 
-if st.button("🎲 生成练习题", type="primary"):
+if submitted:
     with st.spinner("正在生成题目..."):
         st.info("出题功能待实现。完成 RAG 核心功能后将启用此功能。")
 
@@ -2,7 +2,9 @@
 """
 Database initialization script.
 
-Run this script to create all database tables.
+Run this script to create or upgrade the database schema. Tables are
+managed by Alembic migrations (backend/migrations); an up-to-date database
+costs a single alembic_version lookup.
 
 Usage:
     python scripts/init_db.py
@@ -10,16 +12,30 @@ Usage:
 import sys
 import os
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 # Add project root to path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect
 
 from backend.config import get_settings
-from backend.models.database import engine, Base
+from backend.models import Base  # Registers and configures every model
 
-# Import all models to register them
-from backend.models.user import User
-from backend.models.chat_history import ChatSession, ChatMessage
-from backend.models.profile import LearningProfile, KnowledgePointRecord
+# Revision matching the tables create_all built from the original models
+BASELINE_REVISION = "0001"
+
+
+def _is_unversioned(url: str) -> bool:
+    """Whether the tables exist but predate Alembic (created by create_all)"""
+    engine = create_engine(url)
+    try:
+        tables = set(inspect(engine).get_table_names())
+    finally:
+        engine.dispose()
+    return "alembic_version" not in tables and "users" in tables
 
 
 def init_database():
@@ -35,12 +51,19 @@ def init_database():
     print()
     
     try:
-        # Create all tables
-        print("Creating tables...")
-        Base.metadata.create_all(bind=engine)
+        alembic_cfg = Config(os.path.join(PROJECT_ROOT, "alembic.ini"))
+        
+        if _is_unversioned(settings.mysql_url):
+            # Built by create_all before migrations existed: it has at least the
+            # initial schema, and 0002 onwards only apply what is missing
+            print("Existing tables found, marking them as the initial revision...")
+            command.stamp(alembic_cfg, BASELINE_REVISION)
+        
+        print("Applying migrations...")
+        command.upgrade(alembic_cfg, "head")
         
-        # List created tables
-        print("\nTables created:")
+        # List managed tables
+        print("\nTables:")
         for table in Base.metadata.sorted_tables:
             print(f"  ✓ {table.name}")
         
@@ -0,0 +1,74 @@
+"""
+Tests for password hashing and duplicate-account detection
+"""
+import hashlib
+
+import pymysql
+from argon2 import PasswordHasher
+from sqlalchemy.exc import IntegrityError
+
+from backend.services.user_service import AuthService, _duplicate_key_name
+
+
+def _legacy_hash(password: str, salt: str = "abcd1234") -> str:
+    return f"{salt}:{hashlib.sha256((password + salt).encode()).hexdigest()}"
+
+
+def test_argon2_hash_verifies():
+    hashed = AuthService.hash_password("s3cret")
+
+    assert hashed.startswith("$argon2id$")
+    assert AuthService.verify_password("s3cret", hashed)
+    assert not AuthService.verify_password("wrong", hashed)
+
+
+def test_current_argon2_hash_needs_no_rehash():
+    assert not AuthService.needs_rehash(AuthService.hash_password("s3cret"))
+
+
+def test_weaker_argon2_hash_needs_rehash():
+    weak = PasswordHasher(time_cost=1, memory_cost=8192, parallelism=1).hash("s3cret")
+
+    assert AuthService.verify_password("s3cret", weak)
+    assert AuthService.needs_rehash(weak)
+
+
+def test_legacy_hash_verifies_and_needs_rehash():
+    hashed = _legacy_hash("s3cret")
+
+    assert AuthService.verify_password("s3cret", hashed)
+    assert not AuthService.verify_password("wrong", hashed)
+    assert AuthService.needs_rehash(hashed)
+
+
+def test_malformed_hashes_are_rejected():
+    assert not AuthService.verify_password("s3cret", "no-separator")
+    assert not AuthService.verify_password("s3cret", "$argon2id$garbage")
+
+
+def _dup_entry_error(message: str, errno: int = 1062) -> IntegrityError:
+    return IntegrityError("INSERT INTO users ...", {}, pymysql.err.IntegrityError(errno, message))
+
+
+def test_duplicate_key_name_reads_the_key_clause():
+    # MySQL 8 qualifies the index with the table name; 5.7 does not
+    assert _duplicate_key_name(_dup_entry_error(
+        "Duplicate entry 'alice' for key 'users.ix_users_username'"
+    )) == "ix_users_username"
+    assert _duplicate_key_name(_dup_entry_error(
+        "Duplicate entry 'a@b.c' for key 'ix_users_email'"
+    )) == "ix_users_email"
+
+
+def test_duplicate_key_name_ignores_the_entry_value():
+    error = _dup_entry_error(
+        "Duplicate entry 'ix_users_username@x.com' for key 'users.ix_users_email'"
+    )
+
+    assert _duplicate_key_name(error) == "ix_users_email"
+
+
+def test_duplicate_key_name_is_none_for_other_integrity_errors():
+    assert _duplicate_key_name(_dup_entry_error(
+        "Cannot add or update a child row: a foreign key constraint fails", errno=1452
+    )) is None
@@ -0,0 +1,108 @@
+"""
+Tests for keyset pagination of chat messages and sessions
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from backend.models import Base
+from backend.models.chat_history import ChatMessage, ChatSession
+from backend.services.chat_history_service import ChatHistoryService, session_cursor
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _run(test):
+    """Run an async test body against a fresh in-memory database"""
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            await test(db)
+        await engine.dispose()
+
+    asyncio.run(main())
+
+
+async def _add_session(db, n: int, user_id: int = 1) -> ChatSession:
+    session = ChatSession(
+        session_id=f"session-{n}", user_id=user_id, title=f"会话 {n}",
+        created_at=T0, updated_at=T0 + timedelta(minutes=n)
+    )
+    db.add(session)
+    await db.flush()
+    return session
+
+
+def test_limited_history_is_the_newest_page_in_order():
+    async def test(db):
+        session = await _add_session(db, 0)
+        db.add_all(
+            ChatMessage(session_id=session.id, role="user", content=f"m{i}") for i in range(5)
+        )
+        await db.commit()
+        service = ChatHistoryService(db)
+
+        newest = await service.get_session_messages("session-0", limit=2)
+        assert [m.content for m in newest] == ["m3", "m4"]
+
+        earlier = await service.get_session_messages("session-0", limit=2, before_id=newest[0].id)
+        assert [m.content for m in earlier] == ["m1", "m2"]
+
+        last = await service.get_session_messages("session-0", limit=2, before_id=earlier[0].id)
+        assert [m.content for m in last] == ["m0"]
+
+        everything = await service.get_session_messages("session-0")
+        assert [m.content for m in everything] == ["m0", "m1", "m2", "m3", "m4"]
+
+    _run(test)
+
+
+def test_session_pages_follow_the_cursor_they_were_issued_with():
+    async def test(db):
+        sessions = [await _add_session(db, n) for n in range(5)]
+        await _add_session(db, 9, user_id=2)  # Another user's session is never listed
+        await db.commit()
+        service = ChatHistoryService(db)
+
+        first = await service.get_user_sessions(1, limit=2)
+        assert [s.session_id for s in first] == ["session-4", "session-3"]
+        cursor = session_cursor(first[-1])
+
+        # The last session of the page gets a new message before the next page loads
+        sessions[3].updated_at = T0 + timedelta(hours=1)
+        await db.commit()
+
+        second = await service.get_user_sessions(1, limit=2, cursor=cursor)
+        assert [s.session_id for s in second] == ["session-2", "session-1"]
+
+        third = await service.get_user_sessions(1, limit=2, cursor=session_cursor(second[-1]))
+        assert [s.session_id for s in third] == ["session-0"]
+
+    _run(test)
+
+
+def test_sessions_with_equal_updated_at_are_paged_by_id():
+    async def test(db):
+        for n in range(3):
+            db.add(ChatSession(session_id=f"tie-{n}", user_id=1, created_at=T0, updated_at=T0))
+        await db.commit()
+        service = ChatHistoryService(db)
+
+        first = await service.get_user_sessions(1, limit=2)
+        second = await service.get_user_sessions(1, limit=2, cursor=session_cursor(first[-1]))
+
+        assert [s.session_id for s in first + second] == ["tie-2", "tie-1", "tie-0"]
+
+    _run(test)
+
+
+def test_malformed_session_cursor_is_rejected():
+    async def test(db):
+        with pytest.raises(ValueError):
+            await ChatHistoryService(db).get_user_sessions(1, cursor="not-a-cursor")
+
+    _run(test)
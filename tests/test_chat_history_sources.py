@@ -0,0 +1,51 @@
+"""
+Tests for storing message sources as JSON text or a compressed blob
+"""
+import orjson
+
+from backend.models.chat_history import ChatMessage
+from backend.services.chat_history_service import (
+    SOURCES_COMPRESS_BYTES,
+    _dump_sources,
+    _load_sources,
+)
+
+
+def _round_trip(sources):
+    text, blob = _dump_sources(sources)
+    return text, blob, _load_sources(ChatMessage(sources=text, sources_blob=blob))
+
+
+def test_empty_sources_store_nothing():
+    assert _dump_sources(None) == (None, None)
+    assert _dump_sources([]) == (None, None)
+    assert _load_sources(ChatMessage()) == []
+
+
+def test_small_sources_round_trip_as_text():
+    sources = [{"source": "《数据结构》第3页", "content": "栈是后进先出的线性表"}]
+
+    text, blob, loaded = _round_trip(sources)
+
+    assert blob is None
+    assert orjson.loads(text) == sources
+    assert loaded == sources
+
+
+def test_large_sources_round_trip_compressed():
+    sources = [{"source": f"《数据结构》第{i}页", "content": "二叉树" * 50} for i in range(20)]
+    assert len(orjson.dumps(sources)) > SOURCES_COMPRESS_BYTES
+
+    text, blob, loaded = _round_trip(sources)
+
+    assert text is None
+    assert len(blob) < len(orjson.dumps(sources))
+    assert loaded == sources
+
+
+def test_pre_encoded_json_is_accepted():
+    sources = [{"source": "a.md", "content": "x"}]
+
+    _, _, loaded = _round_trip(orjson.dumps(sources).decode())
+
+    assert loaded == sources
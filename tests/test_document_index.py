@@ -0,0 +1,37 @@
+"""
+Tests for the SQLite document index and its knowledge base generation
+"""
+from backend.core.document_index import DocumentIndex
+
+
+def test_upsert_and_delete_are_listed_and_counted(tmp_path):
+    index = DocumentIndex(str(tmp_path))
+    index.upsert("doc-1", "a.pdf", 100, 3)
+    index.upsert("doc-2", "b.md", 200, 2)
+
+    assert index.stats() == (2, 5)
+    assert [d["id"] for d in index.list()] == ["doc-1", "doc-2"]
+
+    index.delete("doc-1")
+    assert index.stats() == (1, 2)
+
+
+def test_every_change_bumps_the_generation(tmp_path):
+    index = DocumentIndex(str(tmp_path))
+    assert index.generation() == 0
+
+    assert index.upsert("doc-1", "a.pdf", 100, 3) == 1
+    assert index.delete("doc-1") == 2
+    assert index.generation() == 2
+
+
+def test_generation_is_shared_between_processes(tmp_path):
+    # Each worker opens its own DocumentIndex on the same file
+    worker_a = DocumentIndex(str(tmp_path))
+    worker_b = DocumentIndex(str(tmp_path))
+    seen_by_b = worker_b.generation()
+
+    worker_a.upsert("doc-1", "a.pdf", 100, 3)
+
+    assert worker_b.generation() == seen_by_b + 1
+    assert DocumentIndex(str(tmp_path)).generation() == 1  # Persisted
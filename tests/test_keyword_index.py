@@ -0,0 +1,148 @@
+"""
+Tests for the BM25 keyword index and reciprocal rank fusion
+"""
+import threading
+import time
+
+import pytest
+
+from backend.core.keyword_index import KeywordIndex, RRF_K, reciprocal_rank_fuse, tokenize
+
+
+def _hit(chunk_id, score=None):
+    hit = {"id": chunk_id, "content": f"text {chunk_id}", "metadata": {"source": chunk_id}}
+    if score is not None:
+        hit["relevance_score"] = score
+    return chunk_id, hit
+
+
+def _wait_for_rebuild(index: KeywordIndex):
+    # The single worker runs jobs in order, so this returns after any queued rebuild
+    index._executor.submit(lambda: None).result()
+
+
+def test_tokenize_keeps_words_and_bigrams_cjk():
+    assert tokenize("BST 二叉树") == ["bst", "二叉", "叉树"]
+    assert tokenize("栈") == ["栈"]
+
+
+def test_search_ranks_matching_chunks():
+    index = KeywordIndex()
+    index.ensure_loaded(lambda: (
+        ["a", "b", "c", "d"],
+        ["二叉树的遍历", "哈希表 hash", "快速排序 quicksort", "图的最短路径"],
+        [{"n": 1}, {"n": 2}, {"n": 3}, {"n": 4}]
+    ))
+
+    results = index.search("quicksort 是什么", n=2)
+
+    assert [chunk_id for chunk_id, _ in results] == ["c"]
+    assert results[0][1] == {"id": "c", "content": "快速排序 quicksort", "metadata": {"n": 3}}
+
+
+def test_add_and_remove_update_the_index():
+    index = KeywordIndex()
+    index.add(["x"], ["ignored before load"], [{}])
+    assert not index.is_loaded
+
+    index.ensure_loaded(lambda: (["a", "b", "c"], ["栈 stack", "队列 queue", "链表 list"], [{}, {}, {}]))
+    index.add(["d"], ["堆 heap"], [{}])
+    _wait_for_rebuild(index)
+    assert [chunk_id for chunk_id, _ in index.search("heap", n=3)] == ["d"]
+
+    index.remove(["d"])
+    _wait_for_rebuild(index)
+    assert index.search("heap", n=3) == []
+
+
+def test_concurrent_first_searches_load_once():
+    index = KeywordIndex()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return ["a", "b", "c"], ["栈 stack", "队列 queue", "链表 list"], [{}, {}, {}]
+
+    threads = [threading.Thread(target=index.ensure_loaded, args=(fetch,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [chunk_id for chunk_id, _ in index.search("stack", n=2)] == ["a"]
+
+
+def test_changes_during_the_load_are_replayed():
+    index = KeywordIndex()
+
+    def fetch():
+        # Written to the collection after the load read it
+        index.add(["c"], ["堆 heap"], [{}])
+        index.remove(["b"])
+        # Already in what the load read; adding it again must not duplicate it
+        index.add(["a"], ["栈 stack"], [{}])
+        return ["a", "b", "x"], ["栈 stack", "队列 queue", "链表 list"], [{}, {}, {}]
+
+    index.ensure_loaded(fetch)
+
+    assert [chunk_id for chunk_id, _ in index.search("heap", n=3)] == ["c"]
+    assert index.search("queue", n=3) == []
+    assert [chunk_id for chunk_id, _ in index.search("stack", n=3)] == ["a"]
+
+
+def test_invalidate_reloads_on_next_use():
+    index = KeywordIndex()
+    corpus = [["a", "b", "c"], ["栈 stack", "队列 queue", "链表 list"], [{}, {}, {}]]
+    index.ensure_loaded(lambda: corpus)
+
+    # Another worker deleted "a" and added "d"
+    corpus = [["b", "c", "d"], ["队列 queue", "链表 list", "堆 heap"], [{}, {}, {}]]
+    index.invalidate()
+    assert not index.is_loaded
+    index.ensure_loaded(lambda: corpus)
+
+    assert index.search("stack", n=3) == []
+    assert [chunk_id for chunk_id, _ in index.search("heap", n=3)] == ["d"]
+
+
+def test_invalidate_during_load_forces_another_load():
+    index = KeywordIndex()
+    corpus = (["a", "b", "c"], ["栈 stack", "队列 queue", "链表 list"], [{}, {}, {}])
+
+    def fetch():
+        index.invalidate()  # The collection changed after this load read it
+        return corpus
+
+    index.ensure_loaded(fetch)
+    assert not index.is_loaded
+
+    index.ensure_loaded(lambda: corpus)
+    assert index.is_loaded
+
+
+def test_fusion_scores_by_reciprocal_rank():
+    vector_hits = [_hit("a", 0.9), _hit("b", 0.8)]
+    keyword_hits = [_hit("b"), _hit("c")]
+
+    fused = reciprocal_rank_fuse((vector_hits, keyword_hits), k=3)
+
+    assert [r["id"] for r in fused] == ["b", "a", "c"]
+    assert fused[0]["rrf_score"] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+    assert fused[1]["rrf_score"] == pytest.approx(1 / (RRF_K + 1))
+
+
+def test_fusion_keeps_first_list_fields_once_per_id():
+    fused = reciprocal_rank_fuse(([_hit("a", 0.7)], [_hit("a"), _hit("k")]), k=5)
+
+    assert len(fused) == 2
+    assert fused[0]["id"] == "a" and fused[0]["relevance_score"] == 0.7
+    # Keyword-only hits carry no vector similarity
+    assert fused[1]["id"] == "k" and fused[1]["relevance_score"] == 0.0
+
+
+def test_fusion_truncates_to_k():
+    hits = [_hit(str(i)) for i in range(10)]
+
+    assert [r["id"] for r in reciprocal_rank_fuse((hits,), k=3)] == ["0", "1", "2"]
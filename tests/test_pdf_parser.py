@@ -0,0 +1,53 @@
+"""
+Tests for header/footer filtering in the PDF parser
+"""
+import fitz
+
+from backend.utils.pdf_parser import PDFParser, _is_header_footer
+
+# A4 portrait: margin bands end at about 59pt from the top and start at about 783pt
+PAGE_HEIGHT = 842
+TOP = PAGE_HEIGHT * 0.07
+BOTTOM = PAGE_HEIGHT * 0.93
+
+
+def _block(y0, y1, text):
+    return (50, y0, 550, y1, text, 0, 0)
+
+
+def test_short_block_in_top_band_is_header():
+    assert _is_header_footer(_block(20, 35, "数据结构 第二章"), TOP, BOTTOM)
+
+
+def test_short_block_in_bottom_band_is_footer():
+    assert _is_header_footer(_block(800, 815, "- 12 -"), TOP, BOTTOM)
+
+
+def test_block_starting_in_top_band_is_kept():
+    assert not _is_header_footer(_block(40, 200, "正文段落"), TOP, BOTTOM)
+
+
+def test_block_running_into_bottom_band_is_kept():
+    assert not _is_header_footer(_block(700, 800, "正文段落"), TOP, BOTTOM)
+
+
+def test_long_block_inside_band_is_kept():
+    assert not _is_header_footer(_block(20, 55, "x" * 200), TOP, BOTTOM)
+
+
+def test_page_text_drops_only_headers_and_footers():
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=PAGE_HEIGHT)
+    page.insert_text((72, 30), "Running header")
+    # Body paragraph whose first line sits inside the top band
+    page.insert_textbox(fitz.Rect(72, 45, 520, 160), "Body starts near the top edge. " * 5)
+    page.insert_text((72, 400), "Middle paragraph")
+    page.insert_text((290, 820), "7")
+
+    text = PDFParser._page_text(page)
+    doc.close()
+
+    assert "Running header" not in text
+    assert "Body starts near the top edge." in text
+    assert "Middle paragraph" in text
+    assert "7" not in text.split()
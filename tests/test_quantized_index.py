@@ -0,0 +1,80 @@
+"""
+Tests for the quantized candidate index and its background rebuilds
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from backend.core.quantized_index import QuantizedIndex
+
+
+def _vectors(rows):
+    vectors = np.asarray(rows, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+IDS = ["a", "b", "c"]
+VECTORS = _vectors([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 1]])
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_rebuild_then_search_finds_nearest(mode):
+    index = QuantizedIndex(mode)
+    assert index.is_stale
+
+    index.rebuild([(IDS[:2], VECTORS[:2]), (IDS[2:], VECTORS[2:])])
+
+    assert not index.is_stale
+    assert index.search(_vectors([[0, 0, 1, 0.9]])[0], n=1) == ["c"]
+
+
+def test_change_during_rebuild_keeps_index_stale():
+    index = QuantizedIndex("int8")
+
+    def batches():
+        yield IDS, VECTORS
+        index.mark_stale()  # A document is added while the rebuild reads the collection
+
+    index.rebuild(batches())
+
+    assert index.is_stale
+
+
+def test_concurrent_schedules_build_once_in_background():
+    index = QuantizedIndex("int8")
+    release = threading.Event()
+    calls = []
+
+    def batches():
+        calls.append(1)
+        release.wait(5)
+        return [(IDS, VECTORS)]
+
+    for _ in range(3):
+        index.schedule_rebuild(batches)
+    assert index.is_stale  # Callers don't wait for the rebuild
+
+    release.set()
+    index._executor.submit(lambda: None).result()  # Wait for the queued rebuild
+
+    assert len(calls) == 1
+    assert not index.is_stale
+    index.schedule_rebuild(batches)  # Fresh: nothing to do
+    index._executor.submit(lambda: None).result()
+    assert len(calls) == 1
+
+
+def test_failed_rebuild_can_be_retried():
+    index = QuantizedIndex("binary")
+
+    def broken():
+        raise RuntimeError("collection unavailable")
+
+    index.schedule_rebuild(broken)
+    index._executor.submit(lambda: None).result()
+    assert index.is_stale
+
+    index.schedule_rebuild(lambda: [(IDS, VECTORS)])
+    index._executor.submit(lambda: None).result()
+    assert not index.is_stale
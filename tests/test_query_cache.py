@@ -0,0 +1,58 @@
+"""
+Tests for the LRU/TTL query cache
+"""
+from backend.utils import query_cache
+from backend.utils.query_cache import QueryCache
+
+
+def test_get_returns_stored_value():
+    cache = QueryCache(max_size=4)
+    cache.set(("q", 5), [1, 2])
+
+    assert cache.get(("q", 5)) == [1, 2]
+    assert cache.get(("q", 3)) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = QueryCache(max_size=4, ttl=10)
+    cache.set("a", 1)
+
+    now[0] += 9.9
+    assert cache.get("a") == 1
+    now[0] += 0.1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_no_ttl_never_expires(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = QueryCache(max_size=4, ttl=None)
+    cache.set("a", 1)
+
+    now[0] += 1e9
+    assert cache.get("a") == 1
+
+
+def test_clear_drops_everything():
+    cache = QueryCache(max_size=4)
+    cache.set("a", 1)
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
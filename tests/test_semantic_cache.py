@@ -0,0 +1,97 @@
+"""
+Tests for the embedding-keyed semantic answer cache
+"""
+import numpy as np
+
+from backend.services import semantic_cache
+from backend.services.semantic_cache import SemanticCache
+
+
+def _unit(*components) -> np.ndarray:
+    vec = np.asarray(components, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def _result(answer: str):
+    return {"answer": answer, "sources": [], "has_context": True}
+
+
+def test_close_embedding_hits():
+    cache = SemanticCache(capacity=4, tau=0.08)
+    cache.insert(_unit(1, 0, 0), _result("栈"))
+
+    # Cosine distance about 0.005, within tau
+    assert cache.lookup(_unit(1, 0.1, 0))["answer"] == "栈"
+
+
+def test_distant_embedding_misses():
+    cache = SemanticCache(capacity=4, tau=0.08)
+    cache.insert(_unit(1, 0, 0), _result("栈"))
+
+    # Cosine distance about 0.29, beyond tau
+    assert cache.lookup(_unit(1, 0.8, 0)) is None
+    assert SemanticCache().lookup(_unit(1, 0, 0)) is None
+
+
+def test_best_match_wins():
+    cache = SemanticCache(capacity=4, tau=0.5)
+    cache.insert(_unit(1, 0, 0), _result("x"))
+    cache.insert(_unit(0, 1, 0), _result("y"))
+
+    assert cache.lookup(_unit(0.1, 1, 0))["answer"] == "y"
+
+
+def test_oldest_entry_is_overwritten_at_capacity():
+    cache = SemanticCache(capacity=2, tau=0.01)
+    cache.insert(_unit(1, 0, 0), _result("a"))
+    cache.insert(_unit(0, 1, 0), _result("b"))
+    cache.insert(_unit(0, 0, 1), _result("c"))
+
+    assert cache.lookup(_unit(1, 0, 0)) is None
+    assert cache.lookup(_unit(0, 1, 0))["answer"] == "b"
+    assert cache.lookup(_unit(0, 0, 1))["answer"] == "c"
+
+    # Keys and results stay aligned as the write position wraps around
+    cache.insert(_unit(1, 1, 0), _result("d"))
+    assert cache.lookup(_unit(0, 1, 0)) is None
+    assert cache.lookup(_unit(0, 0, 1))["answer"] == "c"
+    assert cache.lookup(_unit(1, 1, 0))["answer"] == "d"
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(capacity=4, tau=0.08, ttl=60)
+    cache.insert(_unit(1, 0, 0), _result("old"))
+
+    now[0] += 59
+    assert cache.lookup(_unit(1, 0, 0))["answer"] == "old"
+    now[0] += 1
+    assert cache.lookup(_unit(1, 0, 0)) is None
+
+    # A fresh entry for the same question hits again
+    cache.insert(_unit(1, 0, 0), _result("new"))
+    assert cache.lookup(_unit(1, 0, 0))["answer"] == "new"
+
+
+def test_clear_drops_everything():
+    cache = SemanticCache(capacity=2, tau=0.08)
+    cache.insert(_unit(1, 0, 0), _result("a"))
+    cache.insert(_unit(0, 1, 0), _result("b"))
+    cache.clear()
+
+    assert cache.lookup(_unit(1, 0, 0)) is None
+    cache.insert(_unit(0, 1, 0), _result("c"))
+    assert cache.lookup(_unit(0, 1, 0))["answer"] == "c"
+    assert cache.lookup(_unit(1, 0, 0)) is None
+
+
+def test_entries_from_an_older_generation_miss():
+    cache = SemanticCache(capacity=4, tau=0.08)
+    cache.insert(_unit(1, 0, 0), _result("before upload"), generation=3)
+
+    assert cache.lookup(_unit(1, 0, 0), generation=3)["answer"] == "before upload"
+    assert cache.lookup(_unit(1, 0, 0), generation=4) is None
+
+    cache.insert(_unit(1, 0, 0), _result("after upload"), generation=4)
+    assert cache.lookup(_unit(1, 0, 0), generation=4)["answer"] == "after upload"
@@ -0,0 +1,71 @@
+"""
+Tests for the greedy text splitter
+"""
+from backend.utils.text_splitter import TextSplitter, CodeAwareTextSplitter
+
+
+def test_short_text_is_one_chunk():
+    assert TextSplitter(chunk_size=100)._split("短文本。") == ["短文本。"]
+
+
+def test_blank_text_has_no_chunks():
+    splitter = TextSplitter(chunk_size=100)
+    assert splitter._split("") == []
+    assert splitter._split("   \n ") == []
+
+
+def test_chunks_end_at_paragraph_breaks():
+    paragraphs = ["第{}段。".format(i) + "内容" * 30 for i in range(6)]
+    chunks = TextSplitter(chunk_size=150, chunk_overlap=0)._split("\n\n".join(paragraphs))
+
+    assert all(len(c) <= 150 for c in chunks)
+    # Each chunk holds whole paragraphs
+    assert all(c.startswith("第") and c.endswith("内容") for c in chunks)
+    assert "".join(c.replace("\n\n", "") for c in chunks) == "".join(paragraphs)
+
+
+def test_paragraph_break_after_previous_cut_does_not_emit_sliver():
+    # A paragraph break lands just past the first cut; the old splitter
+    # then emitted a chunk of roughly overlap + a few characters
+    first = "a" * 95 + "\n\n"
+    second = "b" * 5 + "\n\n"
+    rest = " ".join(["word"] * 60)
+    splitter = TextSplitter(chunk_size=100, chunk_overlap=20)
+    chunks = splitter._split(first + second + rest)
+
+    assert all(len(c) >= splitter.chunk_size // 2 for c in chunks[:-1])
+
+
+def test_text_without_separators_is_hard_cut_with_overlap():
+    text = "x" * 250
+    chunks = TextSplitter(chunk_size=100, chunk_overlap=10, separators=[""])._split(text)
+
+    assert [len(c) for c in chunks] == [100, 100, 70]
+
+
+def test_consecutive_chunks_overlap():
+    text = "".join(chr(0x4e00 + i) for i in range(300))  # Distinct characters, no separators
+    chunks = TextSplitter(chunk_size=100, chunk_overlap=20)._split(text)
+
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous[-20:] == current[:20]
+    assert chunks[-1].endswith(text[-1])
+
+
+def test_split_text_attaches_metadata_and_indices():
+    chunks = TextSplitter(chunk_size=50, chunk_overlap=0).split_text(
+        "句子。" * 40, metadata={"source": "a.md"}
+    )
+
+    assert [c["chunk_index"] for c in chunks] == list(range(len(chunks)))
+    assert all(c["metadata"] == {"source": "a.md"} for c in chunks)
+    assert all(c["char_count"] == len(c["content"]) for c in chunks)
+
+
+def test_code_block_is_kept_whole():
+    code = "```c\nvoid f() {\n    return;\n}\n```"
+    text = "前言。" * 10 + "\n" + code + "\n" + "结尾。" * 10
+    chunks = CodeAwareTextSplitter(chunk_size=40, chunk_overlap=5).split_text(text)
+
+    code_chunks = [c for c in chunks if c.get("is_code")]
+    assert [c["content"] for c in code_chunks] == [code]
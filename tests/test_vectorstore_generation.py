@@ -0,0 +1,58 @@
+"""
+Tests for dropping per-worker search state when another worker changes the knowledge base
+"""
+from backend.core.document_index import DocumentIndex
+from backend.core.keyword_index import KeywordIndex
+from backend.core.quantized_index import QuantizedIndex
+from backend.core.vectorstore import VectorStoreManager
+from backend.utils.query_cache import QueryCache
+
+
+def _worker(persist_dir: str) -> VectorStoreManager:
+    """A manager's per-process state over a shared document index, without a Chroma client"""
+    store = object.__new__(VectorStoreManager)
+    store._documents = DocumentIndex(persist_dir)
+    store._search_cache = QueryCache(max_size=16, ttl=None)
+    store._keyword_index = KeywordIndex()
+    store._quantized_index = QuantizedIndex("int8")
+    store._quantized_index.rebuild([])
+    store._generation = store._documents.generation()
+    return store
+
+
+def test_change_by_another_worker_drops_local_state(tmp_path):
+    store = _worker(str(tmp_path))
+    store._keyword_index.ensure_loaded(lambda: (["a"], ["栈 stack"], [{}]))
+    store._search_cache.set("query", ["cached result"])
+
+    DocumentIndex(str(tmp_path)).delete("doc-1")  # Another worker
+    generation = store.generation()
+
+    assert generation == 1
+    assert store._search_cache.get("query") is None
+    assert not store._keyword_index.is_loaded
+    assert store._quantized_index.is_stale
+
+
+def test_unchanged_generation_keeps_local_state(tmp_path):
+    store = _worker(str(tmp_path))
+    store._search_cache.set("query", ["cached result"])
+
+    assert store.generation() == 0
+    assert store._search_cache.get("query") == ["cached result"]
+    assert not store._quantized_index.is_stale
+
+
+def test_own_change_is_not_treated_as_foreign(tmp_path):
+    store = _worker(str(tmp_path))
+    store._search_cache.set("query", ["cached result"])
+
+    store._applied_locally(store._documents.upsert("doc-1", "a.pdf", 1, 1))
+    assert store.generation() == 1
+    assert store._search_cache.get("query") == ["cached result"]
+
+    # A foreign change landing between ours and the next check is still caught
+    DocumentIndex(str(tmp_path)).delete("doc-2")
+    store._applied_locally(store._documents.upsert("doc-3", "c.pdf", 1, 1))
+    assert store.generation() == 3
+    assert store._search_cache.get("query") is None